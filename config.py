@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Optional, Literal
+from functools import lru_cache
 import os
 
 class Settings(BaseSettings):
@@ -9,12 +10,22 @@ class Settings(BaseSettings):
     # Ollama Configuration
     ollama_url: str = Field(default="http://localhost:11434", description="Ollama server URL")
     embedding_model: str = Field(default="mxbai-embed-large:latest", description="Embedding model name")
+    ollama_embed_batch_size: int = Field(default=32, description="Maximum number of texts per Ollama embedding request")
+    ollama_max_concurrency: int = Field(default=3, description="Maximum concurrent Ollama embedding requests")
+    embedding_cache_size: int = Field(default=1024, description="Number of query embeddings kept in memory")
+    embedding_disk_cache_max_entries: int = Field(default=100000, description="Number of embeddings kept in the on-disk cache before the least recently used are pruned (0 disables pruning)")
 
     # Obsidian Vault Configuration
     vault_path: str = Field(..., description="Path to Obsidian vault directory")
 
     # Database Configuration
     chroma_persist_directory: str = Field(default="./chroma_db", description="Chroma database persistence directory")
+    chroma_fast_insert_mode: bool = Field(default=False, description="Disable SQLite journaling and syncs while indexing (faster, not crash safe)")
+    vector_backend: Literal["chroma", "usearch", "flat"] = Field(default="chroma", description="Nearest-neighbour search backend: chroma, usearch (requires the usearch package) or flat brute-force search")
+    vector_quantization: Literal["none", "int8", "binary"] = Field(default="none", description="Search a quantized in-memory copy of the embeddings (none, int8 or binary)")
+    ivf_clusters: int = Field(default=0, description="Number of k-means partitions used to narrow searches (0 disables)")
+    ivf_probe: int = Field(default=8, description="Number of nearest partitions searched per query")
+    store_document_content: bool = Field(default=True, description="Store chunk text in the database (disable to read it back from the vault files)")
 
     # API Configuration
     api_host: str = Field(default="0.0.0.0", description="API host")
@@ -30,6 +41,7 @@ class Settings(BaseSettings):
         env_file = ".env"
         case_sensitive = False
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get application settings"""
+    """Get application settings (built once and cached)"""
     return Settings()
\ No newline at end of file
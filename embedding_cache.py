@@ -0,0 +1,107 @@
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingDiskCache:
+    """Persistent content-addressed embedding cache backed by SQLite"""
+
+    # Stay below SQLite's limit on bound parameters per statement
+    MAX_LOOKUP_KEYS = 500
+
+    # Fraction of max_entries kept after pruning, so pruning runs once per batch of new entries
+    PRUNE_TARGET = 0.9
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Lookups run in worker threads, so the shared connection is serialized with a lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(hash BLOB PRIMARY KEY, embedding BLOB NOT NULL, last_used INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Caches created before pruning existed lack the recency column
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(embeddings)")}
+        if "last_used" not in columns:
+            self.conn.execute("ALTER TABLE embeddings ADD COLUMN last_used INTEGER NOT NULL DEFAULT 0")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+        # Logical clock advanced on every access, ordering entries by recency
+        self._clock, self._count = self.conn.execute(
+            "SELECT COALESCE(MAX(last_used), 0), COUNT(*) FROM embeddings"
+        ).fetchone()
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.conn.close()
+
+    def get_many(self, keys: Iterable[bytes]) -> Dict[bytes, np.ndarray]:
+        """Look up embeddings for the given keys, returning only the ones found"""
+        keys = list(keys)
+        found = {}
+        try:
+            with self._lock:
+                self._clock += 1
+                for i in range(0, len(keys), self.MAX_LOOKUP_KEYS):
+                    batch = keys[i:i + self.MAX_LOOKUP_KEYS]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self.conn.execute(
+                        f"SELECT hash, embedding FROM embeddings WHERE hash IN ({placeholders})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+                    if rows:
+                        self.conn.execute(
+                            f"UPDATE embeddings SET last_used = ? WHERE hash IN ({placeholders})",
+                            [self._clock, *batch]
+                        )
+                if found:
+                    self.conn.commit()
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {e}")
+        return found
+
+    def set_many(self, items: Dict[bytes, np.ndarray]) -> None:
+        """Store embeddings for the given keys, pruning the least recently used ones past max_entries"""
+        if not items:
+            return
+
+        try:
+            with self._lock:
+                self._clock += 1
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, embedding, last_used) VALUES (?, ?, ?)",
+                    [(key, np.asarray(embedding, dtype=np.float32).tobytes(), self._clock)
+                     for key, embedding in items.items()]
+                )
+                # Replaced keys make this an overestimate; it is recounted before pruning
+                self._count += len(items)
+                if self.max_entries > 0 and self._count > self.max_entries:
+                    self._prune()
+                self.conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {e}")
+
+    def _prune(self) -> None:
+        """Delete the least recently used entries down to PRUNE_TARGET of max_entries"""
+        self._count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - int(self.max_entries * self.PRUNE_TARGET)
+        if self._count <= self.max_entries or excess <= 0:
+            return
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE hash IN (SELECT hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._count -= excess
+        logger.info(f"Pruned {excess} least recently used entries from the embedding cache")
@@ -1,25 +1,47 @@
-import gradio as gr
-import requests
+import httpx
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, TYPE_CHECKING
 import os
 from datetime import datetime
 import logging
 
+if TYPE_CHECKING:
+    import gradio as gr
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Markdown template for a single search result
+_RESULT_TMPL = """
+### {i}. {file_name}
+**Similarity Score**: {sim:.3f} | **Distance**: {dist:.3f}
+**Content**: {preview}
+
+---
+"""
+
 class ObsidianSearchUI:
     """Gradio UI for Obsidian Vector Search"""
 
     def __init__(self, api_url: str = "http://localhost:8000"):
         self.api_url = api_url.rstrip('/')
 
-    def test_api_connection(self) -> tuple[str, str]:
+        # Reuse one keep-alive connection pool for all API calls
+        self.client = httpx.AsyncClient(
+            base_url=self.api_url,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=20)
+        )
+
+    async def close(self):
+        """Close the HTTP client"""
+        await self.client.aclose()
+
+    async def test_api_connection(self) -> tuple[str, str]:
         """Test connection to the API and return status and info"""
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=5)
+            response = await self.client.get("/health", timeout=5)
             if response.status_code == 200:
                 health_data = response.json()
                 status = "🟢 Connected"
@@ -32,22 +54,22 @@ class ObsidianSearchUI:
             else:
                 status = "🔴 API Error"
                 info = f"HTTP {response.status_code}: {response.text}"
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             status = "🔴 Connection Failed"
             info = f"Cannot connect to API at {self.api_url}\nError: {str(e)}"
 
         return status, info
 
-    def search_documents(self, query: str, limit: int = 10) -> tuple[str, str]:
-        """Search documents and return formatted results"""
+    async def search_documents(self, query: str, limit: int = 10) -> AsyncIterator[tuple[str, str]]:
+        """Search documents and yield formatted results as they are rendered"""
         if not query.strip():
-            return "❌ Error", "Please enter a search query"
+            yield "❌ Error", "Please enter a search query"
+            return
 
         try:
-            response = requests.post(
-                f"{self.api_url}/search",
-                json={"query": query, "limit": limit},
-                timeout=30
+            response = await self.client.post(
+                "/search",
+                json={"query": query, "limit": limit}
             )
 
             if response.status_code == 200:
@@ -55,37 +77,41 @@ class ObsidianSearchUI:
                 results = data.get('results', [])
 
                 if not results:
-                    return "📭 No Results", f"No documents found for query: '{query}'"
+                    yield "📭 No Results", f"No documents found for query: '{query}'"
+                    return
 
-                # Format results
-                formatted_results = []
+                # Format results, streaming each one to the UI as it is ready
+                formatted_results = ""
                 for i, result in enumerate(results, 1):
                     metadata = result.get('metadata', {})
                     file_name = metadata.get('file_name', 'Unknown')
                     distance = result.get('distance', 0)
                     content_preview = result.get('content', '')[:300] + ('...' if len(result.get('content', '')) > 300 else '')
 
-                    formatted_results.append(f"""
-### {i}. {file_name}
-**Similarity Score**: {1 - distance:.3f} | **Distance**: {distance:.3f}
-**Content**: {content_preview}
-
----
-""")
+                    if formatted_results:
+                        formatted_results += '\n'
+                    formatted_results += _RESULT_TMPL.format(
+                        i=i,
+                        file_name=file_name,
+                        sim=1 - distance,
+                        dist=distance,
+                        preview=content_preview
+                    )
+                    if i < len(results):
+                        yield f"⏳ Showing {i} of {len(results)} results", formatted_results
 
-                status = f"✅ Found {len(results)} results"
-                return status, '\n'.join(formatted_results)
+                yield f"✅ Found {len(results)} results", formatted_results
 
             else:
-                return "❌ Search Error", f"API Error {response.status_code}: {response.text}"
+                yield "❌ Search Error", f"API Error {response.status_code}: {response.text}"
 
-        except requests.exceptions.RequestException as e:
-            return "❌ Connection Error", f"Failed to search: {str(e)}"
+        except httpx.HTTPError as e:
+            yield "❌ Connection Error", f"Failed to search: {str(e)}"
 
-    def get_statistics(self) -> str:
+    async def get_statistics(self) -> str:
         """Get system statistics"""
         try:
-            response = requests.get(f"{self.api_url}/stats", timeout=10)
+            response = await self.client.get("/stats", timeout=10)
             if response.status_code == 200:
                 stats = response.json()
                 vault_stats = stats.get('vault', {})
@@ -116,10 +142,10 @@ class ObsidianSearchUI:
         except Exception as e:
             return f"❌ Error: {str(e)}"
 
-    def manual_reindex(self) -> tuple[str, str]:
+    async def manual_reindex(self) -> tuple[str, str]:
         """Trigger manual reindexing"""
         try:
-            response = requests.post(f"{self.api_url}/reindex", timeout=300)  # 5 minute timeout
+            response = await self.client.post("/reindex", timeout=300)  # 5 minute timeout
             if response.status_code == 200:
                 result = response.json()
                 status = "✅ Reindex Complete"
@@ -135,8 +161,10 @@ class ObsidianSearchUI:
         except Exception as e:
             return "❌ Error", f"Reindex failed: {str(e)}"
 
-def create_ui(api_url: str = "http://localhost:8000") -> gr.Blocks:
+def create_ui(api_url: str = "http://localhost:8000") -> "gr.Blocks":
     """Create and configure the Gradio interface"""
+    # Imported here because gradio is slow to import and only needed to build the UI
+    import gradio as gr
 
     search_ui = ObsidianSearchUI(api_url)
 
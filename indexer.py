@@ -1,10 +1,11 @@
 import os
+import bisect
 import asyncio
 from pathlib import Path
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Set, Optional, Iterator, Tuple
 import logging
-from datetime import datetime
-import hashlib
+import time
+from blake3 import blake3
 
 from ollama_client import OllamaEmbeddingClient
 from vector_db import VectorDatabase
@@ -14,36 +15,36 @@ logger = logging.getLogger(__name__)
 class ObsidianIndexer:
     """Indexes Obsidian vault markdown files into vector database"""
 
+    # How long a vault walk is reused by get_vault_stats
+    FILE_LIST_TTL_SECONDS = 60
+
     def __init__(self, vault_path: str, vector_db: VectorDatabase, ollama_client: OllamaEmbeddingClient):
         self.vault_path = Path(vault_path)
         self.vector_db = vector_db
         self.ollama_client = ollama_client
+        self._file_list_cache: Optional[Tuple[float, List[os.DirEntry]]] = None
 
         if not self.vault_path.exists():
             raise ValueError(f"Vault path does not exist: {vault_path}")
 
-    def _get_file_hash(self, file_path: Path) -> str:
-        """Get MD5 hash of file content"""
-        try:
-            with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
-        except Exception as e:
-            logger.error(f"Error getting hash for {file_path}: {e}")
-            return ""
+    def _get_content_hash(self, data: bytes) -> str:
+        """Get a BLAKE3 digest of file content"""
+        return blake3(data).hexdigest(length=16)
 
     def _read_markdown_file(self, file_path: Path) -> Dict[str, Any]:
         """Read and parse a markdown file"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            # Read once and hash the same buffer instead of re-reading for the hash
+            data = file_path.read_bytes()
+            content = data.decode('utf-8')
 
             stat = file_path.stat()
             metadata = {
                 "file_name": file_path.name,
                 "file_size": stat.st_size,
-                "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                "content_hash": self._get_file_hash(file_path)
+                "modified_at": stat.st_mtime,
+                "created_at": stat.st_ctime,
+                "content_hash": self._get_content_hash(data)
             }
 
             return {
@@ -56,25 +57,63 @@ class ObsidianIndexer:
             logger.error(f"Error reading file {file_path}: {e}")
             return None
 
-    def _get_all_markdown_files(self) -> List[Path]:
+    def _iter_markdown_files(self) -> Iterator[os.DirEntry]:
+        """Iterate over directory entries of all markdown files in the vault"""
+        stack = [str(self.vault_path)]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError as e:
+                # Skip unreadable directories, as os.walk does
+                logger.warning(f"Skipping unreadable directory {directory}: {e}")
+                continue
+            with entries:
+                for entry in entries:
+                    name = entry.name
+                    # Skip hidden files and directories
+                    if name[0] == '.':
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif name[-3:] == '.md':
+                        yield entry
+
+    def _list_markdown_entries(self, refresh: bool = False) -> List[os.DirEntry]:
+        """Get directory entries of all markdown files, reusing a recent vault walk"""
+        now = time.monotonic()
+        if (not refresh and self._file_list_cache is not None and
+                now - self._file_list_cache[0] < self.FILE_LIST_TTL_SECONDS):
+            return self._file_list_cache[1]
+
+        entries = list(self._iter_markdown_files())
+        self._file_list_cache = (now, entries)
+        return entries
+
+    def _get_all_markdown_files(self, refresh: bool = False) -> List[Path]:
         """Get all markdown files in the vault"""
-        markdown_files = []
-        for root, dirs, files in os.walk(self.vault_path):
-            # Skip hidden directories
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-            for file in files:
-                if file.endswith('.md') and not file.startswith('.'):
-                    markdown_files.append(Path(root) / file)
-
-        return markdown_files
-
-    def _chunk_text(self, text: str, max_chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-        """Split text into overlapping chunks for better embedding"""
+        return [Path(entry.path) for entry in self._list_markdown_entries(refresh)]
+
+    def _find_all(self, text: str, sub: str) -> List[int]:
+        """Get the offsets of every occurrence of sub in text, including overlapping ones"""
+        offsets = []
+        i = text.find(sub)
+        while i >= 0:
+            offsets.append(i)
+            i = text.find(sub, i + 1)
+        return offsets
+
+    def _chunk_spans(self, text: str, max_chunk_size: int = 1000, overlap: int = 200) -> List[Tuple[int, int]]:
+        """Get the (start, end) offsets of overlapping chunks of text, with surrounding whitespace trimmed"""
+        # Most notes fit in a single chunk; skip the boundary scan entirely
         if len(text) <= max_chunk_size:
-            return [text]
+            return [(0, len(text))] if text.strip() else []
 
-        chunks = []
+        # Precompute boundary offsets once instead of rescanning each window
+        periods = self._find_all(text, '.')
+        paragraphs = self._find_all(text, '\n\n')
+
+        spans = []
         start = 0
 
         while start < len(text):
@@ -82,86 +121,114 @@ class ObsidianIndexer:
 
             if end < len(text):
                 # Try to break at a sentence or paragraph boundary
-                last_period = text.rfind('.', start, end)
-                last_newline = text.rfind('\n\n', start, end)
+                i = bisect.bisect_left(paragraphs, end - 1) - 1
+                last_newline = paragraphs[i] if i >= 0 else -1
+                i = bisect.bisect_left(periods, end) - 1
+                last_period = periods[i] if i >= 0 else -1
 
                 if last_newline > start:
                     end = last_newline
                 elif last_period > start:
                     end = last_period + 1
 
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
+            window = text[start:end]
+            stripped = window.lstrip()
+            if stripped:
+                chunk_start = start + len(window) - len(stripped)
+                spans.append((chunk_start, chunk_start + len(stripped.rstrip())))
 
             start = end - overlap if end - overlap > start else end
 
-        return chunks
+        return spans
+
+    def _chunk_text(self, text: str, max_chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+        """Split text into overlapping chunks for better embedding"""
+        return [text[start:end] for start, end in self._chunk_spans(text, max_chunk_size, overlap)]
+
+    def _get_existing_document(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Get the stored document for a file, or its first chunk if it was split"""
+        existing_doc = self.vector_db.get_document_by_path(str(file_path), include_content=False)
+        if existing_doc is None:
+            existing_doc = self.vector_db.get_document_by_path(f"{file_path}#0", include_content=False)
+        return existing_doc
 
     async def _process_file(self, file_path: Path) -> List[Dict[str, Any]]:
         """Process a single markdown file into document chunks"""
+        # Cheap precheck: skip the read and hash when size and mtime are unchanged
+        stat = file_path.stat()
+        existing_doc = self._get_existing_document(file_path)
+        if existing_doc:
+            existing_metadata = existing_doc.get("metadata", {})
+            if (existing_metadata.get("file_size") == stat.st_size and
+                    existing_metadata.get("modified_at") == stat.st_mtime):
+                logger.debug(f"File size and mtime unchanged, skipping: {file_path}")
+                return []
+
         file_data = self._read_markdown_file(file_path)
         if not file_data:
             return []
 
         # Check if file has changed by comparing with existing document
-        existing_doc = self.vector_db.get_document_by_path(str(file_path))
         if existing_doc:
             existing_hash = existing_doc.get("metadata", {}).get("content_hash")
             current_hash = file_data["metadata"]["content_hash"]
 
             if existing_hash == current_hash:
                 logger.debug(f"File unchanged, skipping: {file_path}")
+                # Record the new mtime, otherwise the file is listed as changed on every update
+                total_chunks = existing_doc.get("metadata", {}).get("total_chunks", 1)
+                chunk_paths = [f"{file_path}#{i}" for i in range(total_chunks)] if total_chunks > 1 else [str(file_path)]
+                self.vector_db.update_documents_metadata(chunk_paths, {
+                    "modified_at": file_data["metadata"]["modified_at"],
+                    "file_size": file_data["metadata"]["file_size"]
+                })
                 return []
 
         logger.info(f"Processing file: {file_path}")
 
         # Split content into chunks
-        chunks = self._chunk_text(file_data["content"])
+        content = file_data["content"]
+        spans = self._chunk_spans(content)
+        chunks = [content[start:end] for start, end in spans]
         documents = []
 
-        for i, chunk in enumerate(chunks):
-            try:
-                # Generate embedding for chunk
-                embedding = await self.ollama_client.generate_embedding(chunk)
-
-                if embedding:
-                    chunk_metadata = file_data["metadata"].copy()
-                    chunk_metadata.update({
-                        "chunk_index": i,
-                        "total_chunks": len(chunks),
-                        "chunk_size": len(chunk)
-                    })
-
-                    documents.append({
-                        "file_path": f"{file_data['file_path']}#{i}" if len(chunks) > 1 else file_data["file_path"],
-                        "content": chunk,
-                        "metadata": chunk_metadata,
-                        "embedding": embedding
-                    })
-
-            except Exception as e:
-                logger.error(f"Error processing chunk {i} from {file_path}: {e}")
+        # Generate embeddings for all chunks in batched requests
+        embeddings = await self.ollama_client.generate_embeddings(chunks)
+
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+            if not embedding.size:
+                logger.error(f"Error processing chunk {i} from {file_path}: no embedding generated")
+                continue
+
+            chunk_metadata = file_data["metadata"].copy()
+            chunk_metadata.update({
+                "chunk_index": i,
+                "total_chunks": len(chunks),
+                "chunk_size": len(chunk),
+                # Character offsets of the chunk in the file, so its text can be read back from the vault
+                "chunk_start": spans[i][0],
+                "chunk_end": spans[i][1]
+            })
+
+            documents.append({
+                "file_path": f"{file_data['file_path']}#{i}" if len(chunks) > 1 else file_data["file_path"],
+                "content": chunk,
+                "metadata": chunk_metadata,
+                "embedding": embedding
+            })
 
         return documents
 
-    async def index_vault(self, batch_size: int = 10) -> Dict[str, Any]:
-        """Index all markdown files in the vault"""
-        logger.info(f"Starting indexing of vault: {self.vault_path}")
-
-        # Check Ollama connectivity
+    async def _check_ollama(self) -> None:
+        """Ensure the Ollama server is reachable before indexing"""
         if not await self.ollama_client.health_check():
             raise ConnectionError("Cannot connect to Ollama server")
 
         if not await self.ollama_client.check_model_exists():
             logger.warning(f"Model {self.ollama_client.model} may not exist. Proceeding anyway.")
 
-        markdown_files = self._get_all_markdown_files()
-        logger.info(f"Found {len(markdown_files)} markdown files")
-
-        if not markdown_files:
-            return {"processed": 0, "errors": 0, "skipped": 0}
-
+    async def _index_files(self, markdown_files: List[Path], batch_size: int) -> Dict[str, int]:
+        """Process files in batches and add their chunks to the vector database"""
         processed = 0
         errors = 0
         skipped = 0
@@ -171,18 +238,21 @@ class ObsidianIndexer:
             batch = markdown_files[i:i + batch_size]
             batch_documents = []
 
-            for file_path in batch:
-                try:
-                    file_documents = await self._process_file(file_path)
-                    if file_documents:
-                        batch_documents.extend(file_documents)
-                        processed += 1
-                    else:
-                        skipped += 1
+            # Process the files of a batch concurrently so Ollama requests overlap
+            results = await asyncio.gather(
+                *(self._process_file(file_path) for file_path in batch),
+                return_exceptions=True
+            )
 
-                except Exception as e:
-                    logger.error(f"Error processing file {file_path}: {e}")
+            for file_path, file_documents in zip(batch, results):
+                if isinstance(file_documents, Exception):
+                    logger.error(f"Error processing file {file_path}: {file_documents}")
                     errors += 1
+                elif file_documents:
+                    batch_documents.extend(file_documents)
+                    processed += 1
+                else:
+                    skipped += 1
 
             # Add batch to vector database
             if batch_documents:
@@ -192,27 +262,72 @@ class ObsidianIndexer:
                     logger.error(f"Error adding batch to vector database: {e}")
                     errors += len(batch_documents)
 
-        result = {
-            "processed": processed,
-            "errors": errors,
-            "skipped": skipped,
-            "total_files": len(markdown_files)
-        }
+        return {"processed": processed, "errors": errors, "skipped": skipped}
+
+    async def index_vault(self, batch_size: int = 10) -> Dict[str, Any]:
+        """Index all markdown files in the vault"""
+        logger.info(f"Starting indexing of vault: {self.vault_path}")
+
+        await self._check_ollama()
+
+        markdown_files = self._get_all_markdown_files(refresh=True)
+        logger.info(f"Found {len(markdown_files)} markdown files")
+
+        result = await self._index_files(markdown_files, batch_size)
+        result["total_files"] = len(markdown_files)
+
+        # Refresh the search partitions now that every file has been indexed
+        if self.vector_db.ivf_clusters:
+            await asyncio.to_thread(self.vector_db.build_partitions)
 
         logger.info(f"Indexing completed: {result}")
         return result
 
-    async def update_index(self) -> Dict[str, Any]:
+    def _list_changed_files(self) -> Tuple[List[Path], int]:
+        """Get files whose modification time differs from the index, and the total file count"""
+        indexed_mtimes = self.vector_db.get_all_paths_with_mtime()
+
+        entries = self._list_markdown_entries(refresh=True)
+        changed_files = []
+        for entry in entries:
+            try:
+                modified_at = entry.stat().st_mtime
+            except OSError:
+                continue
+            if indexed_mtimes.get(entry.path) != modified_at:
+                changed_files.append(Path(entry.path))
+
+        return changed_files, len(entries)
+
+    async def update_index(self, batch_size: int = 10) -> Dict[str, Any]:
         """Update index with new or changed files"""
-        return await self.index_vault()
+        logger.info(f"Starting incremental update of vault: {self.vault_path}")
+
+        await self._check_ollama()
+
+        changed_files, total_files = self._list_changed_files()
+        logger.info(f"Found {len(changed_files)} new or changed markdown files out of {total_files}")
+
+        result = await self._index_files(changed_files, batch_size)
+        result["skipped"] += total_files - len(changed_files)
+        result["total_files"] = total_files
+
+        logger.info(f"Index update completed: {result}")
+        return result
 
     def get_vault_stats(self) -> Dict[str, Any]:
         """Get statistics about the vault"""
-        markdown_files = self._get_all_markdown_files()
-        total_size = sum(f.stat().st_size for f in markdown_files if f.exists())
+        total_files = 0
+        total_size = 0
+        for entry in self._list_markdown_entries():
+            total_files += 1
+            try:
+                total_size += entry.stat().st_size
+            except OSError:
+                pass
 
         return {
-            "total_files": len(markdown_files),
+            "total_files": total_files,
             "total_size_bytes": total_size,
             "vault_path": str(self.vault_path)
         }
\ No newline at end of file
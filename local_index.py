@@ -0,0 +1,207 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Number of set bits in every byte value, for Hamming distances on packed codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def compute_distances(matrix: np.ndarray, query: np.ndarray, space: str = "l2",
+                      sq_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """Compute distances between each row of matrix and query, matching Chroma's distance functions"""
+    # A single BLAS matrix-vector product does the heavy lifting
+    dots = matrix @ query
+    if space == "ip":
+        return 1.0 - dots
+    if sq_norms is None:
+        sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+    if space == "cosine":
+        norms = np.sqrt(sq_norms) * np.linalg.norm(query)
+        return 1.0 - dots / np.maximum(norms, 1e-12)
+    # Chroma's "l2" space reports squared euclidean distance
+    return sq_norms - 2.0 * dots + query @ query
+
+def nearest_centroids(embeddings: np.ndarray, centroids: np.ndarray, block_size: int = 4096) -> np.ndarray:
+    """Get the index of the nearest centroid (by euclidean distance) for each embedding"""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(embeddings), dtype=np.int64)
+    for start in range(0, len(embeddings), block_size):
+        block = embeddings[start:start + block_size]
+        # |x|^2 is the same for every centroid, so it does not affect the argmin
+        labels[start:start + len(block)] = np.argmin(centroid_norms - 2.0 * (block @ centroids.T), axis=1)
+    return labels
+
+def kmeans(embeddings: np.ndarray, n_clusters: int, iterations: int = 10,
+           sample_size: int = 65536, seed: int = 0) -> np.ndarray:
+    """Fit k-means centroids on a sample of the embeddings with Lloyd's algorithm"""
+    rng = np.random.default_rng(seed)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(embeddings) > sample_size:
+        embeddings = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+
+    n_clusters = min(n_clusters, len(embeddings))
+    centroids = embeddings[rng.choice(len(embeddings), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = nearest_centroids(embeddings, centroids)
+        # Sum each cluster's members in one pass over the embeddings sorted by label
+        order = np.argsort(labels, kind="stable")
+        members, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+        sums = np.add.reduceat(embeddings[order], starts, axis=0)
+        # Clusters that lost all members keep their previous centroid
+        centroids[members] = sums / counts[:, None]
+
+    return centroids
+
+class LocalVectorIndex:
+    """In-memory brute-force vector index over float32, int8 or binary codes"""
+
+    # Rows scored at a time, bounding the temporary float32 buffer when decoding int8 codes
+    BLOCK_SIZE = 4096
+
+    def __init__(self, quantization: str = "none", space: str = "l2"):
+        if quantization not in ("none", "int8", "binary"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.quantization = quantization
+        self.space = space
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._codes: Optional[np.ndarray] = None
+        # Squared norms of unquantized rows, so each search only needs one matrix-vector product
+        self._sq_norms: Optional[np.ndarray] = None
+        # Per-dimension int8 decoding parameters: value = offset + scale * (code + 128)
+        self._offset: Optional[np.ndarray] = None
+        self._scale: Optional[np.ndarray] = None
+        # Upper end of the fitted int8 range, to detect embeddings that would clip
+        self._high: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _fit(self, low: np.ndarray, high: np.ndarray) -> None:
+        """Choose int8 scaling from a per-dimension value range"""
+        self._offset = low
+        self._high = high
+        self._scale = np.maximum(high - low, 1e-12) / 255.0
+
+    def _decode(self, codes: np.ndarray) -> np.ndarray:
+        """Convert int8 codes back to approximate float32 embeddings"""
+        return self._offset + self._scale * (codes.astype(np.float32) + 128)
+
+    def _quantize(self, embeddings: np.ndarray) -> np.ndarray:
+        """Convert float32 embeddings to int8 codes with the current scaling"""
+        codes = np.round((embeddings - self._offset) / self._scale - 128)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def _refit(self, embeddings: np.ndarray) -> None:
+        """Widen the int8 scaling to cover the embeddings, re-encoding the stored codes"""
+        low = np.minimum(self._offset, embeddings.min(axis=0))
+        high = np.maximum(self._high, embeddings.max(axis=0))
+        if np.array_equal(low, self._offset) and np.array_equal(high, self._high):
+            return
+
+        # A range fitted on the first few rows would clip everything added later
+        old_offset, old_scale = self._offset, self._scale
+        self._fit(low, high)
+        if self._codes is not None:
+            for start in range(0, len(self._codes), self.BLOCK_SIZE):
+                block = self._codes[start:start + self.BLOCK_SIZE]
+                decoded = old_offset + old_scale * (block.astype(np.float32) + 128)
+                self._codes[start:start + len(block)] = self._quantize(decoded)
+
+    def _encode(self, embeddings: np.ndarray) -> np.ndarray:
+        """Quantize float32 embeddings to int8 or packed binary codes"""
+        if self.quantization == "none":
+            return embeddings
+        if self.quantization == "binary":
+            return np.packbits(embeddings > 0, axis=1)
+        if self._offset is None:
+            self._fit(embeddings.min(axis=0), embeddings.max(axis=0))
+        else:
+            self._refit(embeddings)
+        return self._quantize(embeddings)
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray) -> None:
+        """Add or replace the codes for the given document IDs"""
+        if not ids:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        if self.dim is not None and embeddings.shape[1] != self.dim:
+            logger.warning("Embedding dimension changed, rebuilding local vector index")
+            self.clear()
+        self.dim = embeddings.shape[1]
+        codes = self._encode(embeddings)
+
+        new_rows = []
+        for i, doc_id in enumerate(ids):
+            row = self._rows.get(doc_id)
+            if row is None:
+                new_rows.append(i)
+            else:
+                self._codes[row] = codes[i]
+                if self._sq_norms is not None:
+                    self._sq_norms[row] = codes[i] @ codes[i]
+
+        if new_rows:
+            for i in new_rows:
+                self._rows[ids[i]] = len(self.ids)
+                self.ids.append(ids[i])
+            # Keep a memory-mapped initial load mapped instead of copying it
+            new_codes = codes if len(new_rows) == len(ids) else codes[new_rows]
+            self._codes = new_codes if self._codes is None else np.concatenate([self._codes, new_codes])
+            if self.quantization == "none":
+                new_norms = np.einsum("ij,ij->i", new_codes, new_codes)
+                self._sq_norms = new_norms if self._sq_norms is None else np.concatenate([self._sq_norms, new_norms])
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove the codes for the given document IDs"""
+        rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+        if not rows:
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self._codes = self._codes[keep]
+        if self._sq_norms is not None:
+            self._sq_norms = self._sq_norms[keep]
+        self.ids = [doc_id for doc_id, kept in zip(self.ids, keep) if kept]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def clear(self) -> None:
+        """Drop all codes and scaling"""
+        self.dim = None
+        self.ids = []
+        self._rows = {}
+        self._codes = None
+        self._sq_norms = None
+        self._offset = None
+        self._scale = None
+        self._high = None
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Get the IDs and distances of the k nearest rows (approximate for quantized codes)"""
+        if self._codes is None or not self.ids:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+
+        if self.quantization == "none":
+            distances = compute_distances(self._codes, query, self.space, self._sq_norms)
+        elif self.quantization == "binary":
+            query_code = np.packbits(query > 0)
+            distances = _POPCOUNT[self._codes ^ query_code].sum(axis=1, dtype=np.int32)
+        else:
+            distances = np.empty(len(self.ids), dtype=np.float32)
+            for start in range(0, len(self.ids), self.BLOCK_SIZE):
+                block = self._codes[start:start + self.BLOCK_SIZE]
+                distances[start:start + len(block)] = compute_distances(self._decode(block), query, self.space)
+
+        k = min(k, len(self.ids))
+        if k < len(self.ids):
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            top = np.arange(k)
+        top = top[np.argsort(distances[top], kind="stable")]
+        return [(self.ids[row], float(distances[row])) for row in top]
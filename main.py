@@ -1,16 +1,15 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+import os
 import logging
 import asyncio
 from contextlib import asynccontextmanager
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-
 from config import get_settings
 from ollama_client import OllamaEmbeddingClient
+from embedding_cache import EmbeddingDiskCache
 from vector_db import VectorDatabase
 from indexer import ObsidianIndexer
 
@@ -19,8 +18,6 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Global variables
-settings = get_settings()
-scheduler = AsyncIOScheduler()
 ollama_client: Optional[OllamaEmbeddingClient] = None
 vector_db: Optional[VectorDatabase] = None
 indexer: Optional[ObsidianIndexer] = None
@@ -58,14 +55,47 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     global ollama_client, vector_db, indexer
 
+    # Imported lazily so importing this module stays cheap
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.interval import IntervalTrigger
+
     logger.info("Starting up Obsidian Vector Search API...")
+    settings = app.dependency_overrides.get(get_settings, get_settings)()
+    # Values read by request handlers, bound once so requests skip Pydantic attribute access
+    app.state.handler_settings = {
+        "vault_path": settings.vault_path,
+        "summary": {
+            "ollama_url": settings.ollama_url,
+            "embedding_model": settings.embedding_model,
+            "index_interval_minutes": settings.index_interval_minutes
+        }
+    }
 
     # Initialize components
-    ollama_client = OllamaEmbeddingClient(settings.ollama_url, settings.embedding_model)
-    vector_db = VectorDatabase(settings.chroma_persist_directory)
+    ollama_client = OllamaEmbeddingClient(
+        settings.ollama_url,
+        settings.embedding_model,
+        batch_size=settings.ollama_embed_batch_size,
+        max_concurrency=settings.ollama_max_concurrency,
+        cache_size=settings.embedding_cache_size,
+        disk_cache=EmbeddingDiskCache(
+            os.path.join(settings.chroma_persist_directory, "embedding_cache.sqlite3"),
+            max_entries=settings.embedding_disk_cache_max_entries
+        )
+    )
+    vector_db = VectorDatabase(
+        settings.chroma_persist_directory,
+        quantization=settings.vector_quantization,
+        backend=settings.vector_backend,
+        fast_insert_mode=settings.chroma_fast_insert_mode,
+        ivf_clusters=settings.ivf_clusters,
+        ivf_probe=settings.ivf_probe,
+        store_content=settings.store_document_content
+    )
     indexer = ObsidianIndexer(settings.vault_path, vector_db, ollama_client)
 
     # Start background scheduler
+    scheduler = AsyncIOScheduler()
     scheduler.add_job(
         periodic_index_update,
         trigger=IntervalTrigger(minutes=settings.index_interval_minutes),
@@ -83,6 +113,8 @@ async def lifespan(app: FastAPI):
     scheduler.shutdown()
     if ollama_client:
         await ollama_client.close()
+    if vector_db:
+        vector_db.close()
 
 app = FastAPI(
     title="Obsidian Vector Search API",
@@ -91,6 +123,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+def get_handler_settings(request: Request) -> Dict[str, Any]:
+    """Get the settings values bound at startup"""
+    return request.app.state.handler_settings
+
 async def periodic_index_update():
     """Background task to periodically update the index"""
     try:
@@ -106,7 +142,7 @@ async def root():
     return {"message": "Obsidian Vector Search API", "version": "1.0.0"}
 
 @app.get("/health", response_model=HealthResponse)
-async def health_check():
+async def health_check(handler_settings: Dict[str, Any] = Depends(get_handler_settings)):
     """Health check endpoint"""
     ollama_connected = await ollama_client.health_check()
     db_info = vector_db.get_collection_info()
@@ -115,7 +151,7 @@ async def health_check():
         status="healthy" if ollama_connected else "degraded",
         ollama_connected=ollama_connected,
         database_status=f"{db_info['document_count']} documents",
-        vault_path=settings.vault_path
+        vault_path=handler_settings["vault_path"]
     )
 
 @app.post("/search", response_model=SearchResponse)
@@ -125,11 +161,11 @@ async def search(request: SearchRequest):
         # Generate embedding for query
         query_embedding = await ollama_client.generate_embedding(request.query)
 
-        if not query_embedding:
+        if not query_embedding.size:
             raise HTTPException(status_code=500, detail="Failed to generate embedding for query")
 
         # Search vector database
-        search_results = vector_db.search(query_embedding, request.limit)
+        search_results = await vector_db.asearch(query_embedding, request.limit)
 
         # Format response
         results = [
@@ -163,7 +199,7 @@ async def manual_reindex(background_tasks: BackgroundTasks):
         raise HTTPException(status_code=500, detail=f"Reindex failed: {str(e)}")
 
 @app.get("/stats")
-async def get_stats():
+async def get_stats(handler_settings: Dict[str, Any] = Depends(get_handler_settings)):
     """Get statistics about the vault and database"""
     try:
         vault_stats = indexer.get_vault_stats()
@@ -172,11 +208,7 @@ async def get_stats():
         return {
             "vault": vault_stats,
             "database": db_info,
-            "settings": {
-                "ollama_url": settings.ollama_url,
-                "embedding_model": settings.embedding_model,
-                "index_interval_minutes": settings.index_interval_minutes
-            }
+            "settings": handler_settings["summary"]
         }
     except Exception as e:
         logger.error(f"Stats error: {e}")
@@ -197,6 +229,7 @@ async def delete_document(file_path: str):
 
 if __name__ == "__main__":
     import uvicorn
+    settings = get_settings()
     uvicorn.run(
         "main:app",
         host=settings.api_host,
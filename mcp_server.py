@@ -7,10 +7,12 @@ Provides AI models with semantic search capabilities for Obsidian vaults
 import sys
 import os
 import asyncio
+import faulthandler
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+import orjson
+from datetime import datetime
 
 # Add current directory to Python path for imports
 sys.path.insert(0, str(Path(__file__).parent))
@@ -20,8 +22,10 @@ from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 from config import get_settings
 from ollama_client import OllamaEmbeddingClient
+from embedding_cache import EmbeddingDiskCache
 from vector_db import VectorDatabase
 from indexer import ObsidianIndexer
+from search_cache import SemanticSearchCache
 
 # Configure logging to stderr (never stdout for MCP servers)
 logging.basicConfig(
@@ -31,11 +35,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Fixed error responses, serialized once at load time
+_ERR_SEARCH_NOT_INITIALIZED = [TextContent(type="text", text=orjson.dumps({"error": "Vector search components not initialized"}).decode())]
+_ERR_EMBEDDING_FAILED = [TextContent(type="text", text=orjson.dumps({"error": "Failed to generate embedding for query"}).decode())]
+_ERR_DB_NOT_INITIALIZED = [TextContent(type="text", text=orjson.dumps({"error": "Vector database not initialized"}).decode())]
+_ERR_COMPONENTS_NOT_INITIALIZED = [TextContent(type="text", text=orjson.dumps({"error": "Components not initialized"}).decode())]
+_ERR_INDEXER_NOT_INITIALIZED = [TextContent(type="text", text=orjson.dumps({"error": "Indexer not initialized"}).decode())]
+
 # Global components
 settings = None
 ollama_client = None
 vector_db = None
 indexer = None
+search_cache = SemanticSearchCache()
 
 async def initialize_components():
     """Initialize all components needed for the MCP server"""
@@ -46,17 +58,39 @@ async def initialize_components():
         logger.info(f"Initialized settings - Vault: {settings.vault_path}")
 
         # Initialize Ollama client
-        ollama_client = OllamaEmbeddingClient(settings.ollama_url, settings.embedding_model)
+        ollama_client = OllamaEmbeddingClient(
+            settings.ollama_url,
+            settings.embedding_model,
+            batch_size=settings.ollama_embed_batch_size,
+            max_concurrency=settings.ollama_max_concurrency,
+            cache_size=settings.embedding_cache_size,
+            disk_cache=EmbeddingDiskCache(
+                os.path.join(settings.chroma_persist_directory, "embedding_cache.sqlite3"),
+                max_entries=settings.embedding_disk_cache_max_entries
+            )
+        )
         logger.info(f"Initialized Ollama client - URL: {settings.ollama_url}")
 
-        # Test Ollama connection
-        if not await ollama_client.health_check():
+        # Test Ollama connection while the vector database loads
+        ollama_ok, vector_db = await asyncio.gather(
+            ollama_client.health_check(),
+            asyncio.to_thread(
+                VectorDatabase,
+                settings.chroma_persist_directory,
+                quantization=settings.vector_quantization,
+                backend=settings.vector_backend,
+                fast_insert_mode=settings.chroma_fast_insert_mode,
+                ivf_clusters=settings.ivf_clusters,
+                ivf_probe=settings.ivf_probe,
+                store_content=settings.store_document_content
+            )
+        )
+        if not ollama_ok:
             logger.warning("Ollama server is not accessible")
         else:
             logger.info("Ollama server is accessible")
 
-        # Initialize vector database
-        vector_db = VectorDatabase(settings.chroma_persist_directory)
+        # Report vector database
         db_info = vector_db.get_collection_info()
         logger.info(f"Initialized vector database - Documents: {db_info['document_count']}")
 
@@ -70,82 +104,110 @@ async def initialize_components():
         logger.error(f"Failed to initialize components: {e}")
         return False
 
+def format_timestamp(value: Any) -> Any:
+    """Format a stored epoch timestamp as ISO 8601, passing other values through"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).isoformat()
+    return value
+
+def format_search_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a vector database hit for AI consumption"""
+    metadata = result.get("metadata", {})
+    return {
+        "file_name": metadata.get("file_name", "Unknown"),
+        "file_path": metadata.get("file_path", "Unknown"),
+        "content": result.get("content", ""),
+        "similarity_score": round(1 - result.get("distance", 1), 4),
+        "distance": round(result.get("distance", 1), 4),
+        "chunk_info": {
+            "chunk_index": metadata.get("chunk_index", 0),
+            "total_chunks": metadata.get("total_chunks", 1),
+            "chunk_size": metadata.get("chunk_size")  # Always stored by the indexer
+        },
+        "file_info": {
+            "modified_at": format_timestamp(metadata.get("modified_at")),
+            "file_size": metadata.get("file_size"),
+            "content_hash": metadata.get("content_hash", "")[:8]  # Short hash for reference
+        }
+    }
+
 # Create MCP server
 server = Server("obsidian-vector-search")
 
+# Tool definitions are static, so build them once and reuse them for every list_tools call
+_TOOLS = [
+    Tool(
+        name="search_obsidian",
+        description="Search your Obsidian vault using semantic similarity",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Natural language search query (e.g., 'machine learning concepts', 'project ideas')",
+                    "minLength": 1,
+                    "maxLength": 1000,
+                    "pattern": "\\S"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of results to return (1-50)",
+                    "minimum": 1,
+                    "maximum": 50,
+                    "default": 10
+                }
+            },
+            "required": ["query"]
+        }
+    ),
+    Tool(
+        name="get_document_content",
+        description="Get the full content of a specific document from your Obsidian vault",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": {
+                    "type": "string",
+                    "description": "Path to the document (from search results)"
+                }
+            },
+            "required": ["file_path"]
+        }
+    ),
+    Tool(
+        name="get_vault_statistics",
+        description="Get statistics about your Obsidian vault and the vector database",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    ),
+    Tool(
+        name="reindex_vault",
+        description="Manually trigger reindexing of your Obsidian vault",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    )
+]
+
 @server.list_tools()
 async def list_tools() -> List[Tool]:
     """List available tools"""
-    return [
-        Tool(
-            name="search_obsidian",
-            description="Search your Obsidian vault using semantic similarity",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "Natural language search query (e.g., 'machine learning concepts', 'project ideas')"
-                    },
-                    "limit": {
-                        "type": "integer",
-                        "description": "Maximum number of results to return (1-50)",
-                        "minimum": 1,
-                        "maximum": 50,
-                        "default": 10
-                    }
-                },
-                "required": ["query"]
-            }
-        ),
-        Tool(
-            name="get_document_content",
-            description="Get the full content of a specific document from your Obsidian vault",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "file_path": {
-                        "type": "string",
-                        "description": "Path to the document (from search results)"
-                    }
-                },
-                "required": ["file_path"]
-            }
-        ),
-        Tool(
-            name="get_vault_statistics",
-            description="Get statistics about your Obsidian vault and the vector database",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        ),
-        Tool(
-            name="reindex_vault",
-            description="Manually trigger reindexing of your Obsidian vault",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        )
-    ]
+    return _TOOLS
 
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> List[TextContent]:
     """Handle tool calls"""
 
-    if name == "search_obsidian":
-        return await search_obsidian_tool(arguments)
-    elif name == "get_document_content":
-        return await get_document_content_tool(arguments)
-    elif name == "get_vault_statistics":
-        return await get_vault_statistics_tool(arguments)
-    elif name == "reindex_vault":
-        return await reindex_vault_tool(arguments)
+    handler = TOOL_HANDLERS.get(name)
+    if handler:
+        return await handler(arguments)
     else:
-        return [TextContent(type="text", text=json.dumps({"error": f"Unknown tool: {name}"}))]
+        return [TextContent(type="text", text=orjson.dumps({"error": f"Unknown tool: {name}"}).decode())]
 
 async def search_obsidian_tool(arguments: dict) -> List[TextContent]:
     """Search Obsidian vault using semantic similarity"""
@@ -156,12 +218,7 @@ async def search_obsidian_tool(arguments: dict) -> List[TextContent]:
         logger.info(f"Searching for: '{query}' (limit: {limit})")
 
         if not ollama_client or not vector_db:
-            result = {"error": "Vector search components not initialized"}
-            return [TextContent(type="text", text=json.dumps(result))]
-
-        if not query.strip():
-            result = {"error": "Query cannot be empty"}
-            return [TextContent(type="text", text=json.dumps(result))]
+            return _ERR_SEARCH_NOT_INITIALIZED
 
         # Validate limit
         limit = max(1, min(50, limit))
@@ -169,50 +226,33 @@ async def search_obsidian_tool(arguments: dict) -> List[TextContent]:
         # Generate embedding for query
         query_embedding = await ollama_client.generate_embedding(query)
 
-        if not query_embedding:
-            result = {"error": "Failed to generate embedding for query"}
-            return [TextContent(type="text", text=json.dumps(result))]
+        if not query_embedding.size:
+            return _ERR_EMBEDDING_FAILED
 
-        # Search vector database
-        search_results = vector_db.search(query_embedding, limit)
+        # Reuse results of a recent near-identical query
+        formatted_results = search_cache.get(query_embedding, limit)
 
-        # Format results for AI consumption
-        formatted_results = []
-        for result in search_results.get("results", []):
-            metadata = result.get("metadata", {})
+        if formatted_results is None:
+            # Search vector database without blocking the event loop
+            search_results = await vector_db.asearch(query_embedding, limit)
 
-            formatted_result = {
-                "file_name": metadata.get("file_name", "Unknown"),
-                "file_path": metadata.get("file_path", "Unknown"),
-                "content": result.get("content", ""),
-                "similarity_score": round(1 - result.get("distance", 1), 4),
-                "distance": round(result.get("distance", 1), 4),
-                "chunk_info": {
-                    "chunk_index": metadata.get("chunk_index", 0),
-                    "total_chunks": metadata.get("total_chunks", 1),
-                    "chunk_size": metadata.get("chunk_size", len(result.get("content", "")))
-                },
-                "file_info": {
-                    "modified_at": metadata.get("modified_at"),
-                    "file_size": metadata.get("file_size"),
-                    "content_hash": metadata.get("content_hash", "")[:8]  # Short hash for reference
-                }
-            }
-            formatted_results.append(formatted_result)
+            # Format results for AI consumption
+            formatted_results = [format_search_result(result) for result in search_results.get("results", [])]
+            search_cache.put(query_embedding, limit, formatted_results)
 
         response = {
             "query": query,
-            "total_results": search_results.get("total_results", 0),
+            "total_results": len(formatted_results),
             "results": formatted_results
         }
 
         logger.info(f"Found {len(formatted_results)} results for query: '{query}'")
-        return [TextContent(type="text", text=json.dumps(response, indent=2))]
+        return [TextContent(type="text", text=orjson.dumps(response).decode())]
 
     except Exception as e:
         error_msg = f"Search failed: {str(e)}"
         logger.error(error_msg)
-        return [TextContent(type="text", text=json.dumps({"error": error_msg}))]
+        return [TextContent(type="text", text=orjson.dumps({"error": error_msg}).decode())]
 
 async def get_document_content_tool(arguments: dict) -> List[TextContent]:
     """Get the full content of a specific document"""
@@ -221,14 +261,13 @@ async def get_document_content_tool(arguments: dict) -> List[TextContent]:
         logger.info(f"Getting document: {file_path}")
 
         if not vector_db:
-            result = {"error": "Vector database not initialized"}
-            return [TextContent(type="text", text=json.dumps(result))]
+            return _ERR_DB_NOT_INITIALIZED
 
         # Handle chunked file paths (remove chunk suffix)
         base_file_path = file_path.split('#')[0] if '#' in file_path else file_path
 
         # Try to get document from database
-        document = vector_db.get_document_by_path(base_file_path)
+        document = await asyncio.to_thread(vector_db.get_document_by_path, base_file_path)
 
         if document:
             metadata = document.get("metadata", {})
@@ -238,23 +277,23 @@ async def get_document_content_tool(arguments: dict) -> List[TextContent]:
                 "content": document.get("content", ""),
                 "metadata": {
                     "file_size": metadata.get("file_size"),
-                    "modified_at": metadata.get("modified_at"),
-                    "created_at": metadata.get("created_at"),
+                    "modified_at": format_timestamp(metadata.get("modified_at")),
+                    "created_at": format_timestamp(metadata.get("created_at")),
                     "chunk_info": {
                         "chunk_index": metadata.get("chunk_index", 0),
                         "total_chunks": metadata.get("total_chunks", 1)
                     }
                 }
             }
-            return [TextContent(type="text", text=json.dumps(response, indent=2))]
+            return [TextContent(type="text", text=orjson.dumps(response).decode())]
         else:
             result = {"error": f"Document not found: {file_path}"}
-            return [TextContent(type="text", text=json.dumps(result))]
+            return [TextContent(type="text", text=orjson.dumps(result).decode())]
 
     except Exception as e:
         error_msg = f"Failed to get document: {str(e)}"
         logger.error(error_msg)
-        return [TextContent(type="text", text=json.dumps({"error": error_msg}))]
+        return [TextContent(type="text", text=orjson.dumps({"error": error_msg}).decode())]
 
 async def get_vault_statistics_tool(arguments: dict) -> List[TextContent]:
     """Get statistics about the vault and database"""
@@ -262,18 +301,22 @@ async def get_vault_statistics_tool(arguments: dict) -> List[TextContent]:
         logger.info("Getting vault statistics")
 
         if not vector_db or not indexer:
-            result = {"error": "Components not initialized"}
-            return [TextContent(type="text", text=json.dumps(result))]
+            return _ERR_COMPONENTS_NOT_INITIALIZED
 
-        # Get database info
-        db_info = vector_db.get_collection_info()
-
-        # Get vault stats
-        vault_stats = indexer.get_vault_stats()
+        # Get database info and vault stats off the event loop
+        db_info, vault_stats = await asyncio.gather(
+            asyncio.to_thread(vector_db.get_collection_info),
+            asyncio.to_thread(indexer.get_vault_stats)
+        )
 
         # Get Ollama connection status
-        ollama_status = await ollama_client.health_check() if ollama_client else False
-        model_exists = await ollama_client.check_model_exists() if ollama_client else False
+        if ollama_client:
+            ollama_status, model_exists = await asyncio.gather(
+                ollama_client.health_check(),
+                ollama_client.check_model_exists()
+            )
+        else:
+            ollama_status = model_exists = False
 
         response = {
             "vault": {
@@ -292,12 +335,12 @@ async def get_vault_statistics_tool(arguments: dict) -> List[TextContent]:
             }
         }
 
-        return [TextContent(type="text", text=json.dumps(response, indent=2))]
+        return [TextContent(type="text", text=orjson.dumps(response).decode())]
 
     except Exception as e:
         error_msg = f"Failed to get statistics: {str(e)}"
         logger.error(error_msg)
-        return [TextContent(type="text", text=json.dumps({"error": error_msg}))]
+        return [TextContent(type="text", text=orjson.dumps({"error": error_msg}).decode())]
 
 async def reindex_vault_tool(arguments: dict) -> List[TextContent]:
     """Manually trigger reindexing of the vault"""
@@ -305,11 +348,11 @@ async def reindex_vault_tool(arguments: dict) -> List[TextContent]:
         logger.info("Starting manual vault reindexing")
 
         if not indexer:
-            result = {"error": "Indexer not initialized"}
-            return [TextContent(type="text", text=json.dumps(result))]
+            return _ERR_INDEXER_NOT_INITIALIZED
 
         # Trigger reindexing
         result = await indexer.index_vault()
+        search_cache.clear()
 
         response = {
             "status": "completed",
@@ -323,12 +366,20 @@ async def reindex_vault_tool(arguments: dict) -> List[TextContent]:
         }
 
         logger.info(f"Reindexing completed: {response['results']}")
-        return [TextContent(type="text", text=json.dumps(response, indent=2))]
+        return [TextContent(type="text", text=orjson.dumps(response).decode())]
 
     except Exception as e:
         error_msg = f"Reindexing failed: {str(e)}"
         logger.error(error_msg)
-        return [TextContent(type="text", text=json.dumps({"error": error_msg, "status": "failed"}))]
+        return [TextContent(type="text", text=orjson.dumps({"error": error_msg, "status": "failed"}).decode())]
+
+# Tool name to handler mapping used by call_tool
+TOOL_HANDLERS: Dict[str, Callable[[dict], Awaitable[List[TextContent]]]] = {
+    "search_obsidian": search_obsidian_tool,
+    "get_document_content": get_document_content_tool,
+    "get_vault_statistics": get_vault_statistics_tool,
+    "reindex_vault": reindex_vault_tool
+}
 
 async def main():
     """Main entry point for the MCP server"""
@@ -342,14 +393,30 @@ async def main():
     logger.info("MCP Server initialized successfully")
 
     # Run the MCP server using stdio transport
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        if ollama_client:
+            await ollama_client.close()
+        if vector_db:
+            vector_db.close()
 
 if __name__ == "__main__":
+    # Dump tracebacks to stderr on fatal errors (stdout is reserved for MCP)
+    faulthandler.enable(file=sys.stderr)
+
+    # Use the faster libuv-based event loop when available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
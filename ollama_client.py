@@ -1,33 +1,174 @@
 import httpx
+import orjson
+import numpy as np
 import asyncio
-from typing import List, Dict, Any
+import hashlib
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
+from embedding_cache import EmbeddingDiskCache
+
 logger = logging.getLogger(__name__)
 
+# Returned in place of an embedding that could not be generated
+_EMPTY_EMBEDDING = np.empty(0, dtype=np.float32)
+
 class OllamaEmbeddingClient:
     """Client for generating embeddings using Ollama"""
 
-    def __init__(self, base_url: str, model: str):
+    # How long a successful /api/tags response is reused by health and model checks
+    TAGS_TTL_SECONDS = 30
+
+    def __init__(self, base_url: str, model: str, batch_size: int = 32, max_concurrency: int = 3,
+                 cache_size: int = 1024, disk_cache: Optional[EmbeddingDiskCache] = None):
         self.base_url = base_url.rstrip('/')
         self.model = model
-        self.client = httpx.AsyncClient(timeout=60.0)
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self._request_semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self.disk_cache = disk_cache
+        self._tags_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        # In-flight /api/tags fetch shared by concurrent callers
+        self._tags_task: Optional["asyncio.Future[Optional[Dict[str, Any]]]"] = None
+        self.client = httpx.AsyncClient(
+            timeout=60.0,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max(32, self.max_concurrency * 2),
+                max_keepalive_connections=max(16, self.max_concurrency)
+            )
+        )
 
     async def close(self):
         """Close the HTTP client"""
         await self.client.aclose()
+        if self.disk_cache:
+            self.disk_cache.close()
+
+    def _cache_key(self, text: str) -> bytes:
+        """Get the cache key for a text, including the model so model switches never hit stale vectors"""
+        return hashlib.sha256(f"{self.model}\0{text}".encode()).digest()
+
+    async def generate_embedding(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text, reusing recent results for repeated texts"""
+        key = self._cache_key(text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
 
-    async def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a single text"""
         embeddings = await self.generate_embeddings([text])
-        return embeddings[0] if embeddings else []
+        embedding = embeddings[0] if embeddings else _EMPTY_EMBEDDING
 
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
-        embeddings = []
+        if embedding.size and self.cache_size > 0:
+            self._cache[key] = embedding
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return embedding
 
+    async def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """Generate float32 embeddings for multiple texts, embedding each distinct text only once"""
+        # Repeated chunks (templates, footers) are embedded once and fanned back out
+        positions = {}
+        unique_texts = []
         for text in texts:
-            try:
+            if text not in positions:
+                positions[text] = len(unique_texts)
+                unique_texts.append(text)
+
+        embeddings = await self._embed_with_disk_cache(unique_texts)
+        return [embeddings[positions[text]] for text in texts]
+
+    async def _embed_with_disk_cache(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed texts, only requesting the ones missing from the disk cache"""
+        if self.disk_cache is None:
+            return await self._embed_texts(texts)
+
+        keys = [self._cache_key(text) for text in texts]
+        # SQLite reads and writes run in a worker thread to keep the event loop free
+        found = await asyncio.to_thread(self.disk_cache.get_many, keys)
+
+        misses = [i for i, key in enumerate(keys) if key not in found]
+        if misses:
+            new_embeddings = {}
+            for i, embedding in zip(misses, await self._embed_texts([texts[i] for i in misses])):
+                if embedding.size:
+                    new_embeddings[keys[i]] = embedding
+            await asyncio.to_thread(self.disk_cache.set_many, new_embeddings)
+            found.update(new_embeddings)
+
+        return [found.get(key, _EMPTY_EMBEDDING) for key in keys]
+
+    async def _embed_texts(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed texts with Ollama, sending up to batch_size texts per /api/embed request"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        # Batches run concurrently; _post_batch bounds in-flight requests to max_concurrency
+        results = await asyncio.gather(*(self._post_batch(batch) for batch in batches), return_exceptions=True)
+
+        embeddings = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error generating embeddings for batch: {result}")
+                embeddings.extend(_EMPTY_EMBEDDING for _ in batch)
+            else:
+                embeddings.extend(result)
+        return embeddings
+
+    async def _post_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed a batch of texts with one /api/embed request, halving it if it is too large"""
+        try:
+            async with self._request_semaphore:
+                response = await self.client.post(
+                    f"{self.base_url}/api/embed",
+                    content=orjson.dumps({
+                        "model": self.model,
+                        "input": texts
+                    }),
+                    headers={"Content-Type": "application/json"}
+                )
+            if response.status_code == 413 and len(texts) > 1:
+                logger.warning(f"Embedding request for {len(texts)} texts too large, retrying in halves")
+                return await self._split_batch(texts)
+            response.raise_for_status()
+
+            embeddings = orjson.loads(response.content).get("embeddings")
+            if embeddings and len(embeddings) == len(texts):
+                # Convert once to a contiguous float32 matrix instead of keeping boxed Python floats
+                return list(np.asarray(embeddings, dtype=np.float32))
+            logger.warning("Unexpected response from /api/embed, falling back to per-text requests")
+
+        except httpx.TimeoutException as e:
+            if len(texts) > 1:
+                logger.warning(f"Embedding request for {len(texts)} texts timed out, retrying in halves")
+                return await self._split_batch(texts)
+            logger.warning(f"Batch embedding failed, falling back to per-text requests: {e}")
+
+        except Exception as e:
+            logger.warning(f"Batch embedding failed, falling back to per-text requests: {e}")
+
+        return await self._generate_embeddings_legacy(texts)
+
+    async def _split_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed a batch as two halves and shrink the batch size for later requests"""
+        mid = len(texts) // 2
+        self.batch_size = min(self.batch_size, mid)
+        first, second = await asyncio.gather(self._post_batch(texts[:mid]), self._post_batch(texts[mid:]))
+        return first + second
+
+    async def _generate_embeddings_legacy(self, texts: List[str]) -> List[np.ndarray]:
+        """Generate embeddings with concurrent per-text requests to the legacy /api/embeddings endpoint"""
+        return list(await asyncio.gather(*(self._generate_embedding_legacy(text) for text in texts)))
+
+    async def _generate_embedding_legacy(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text with the legacy /api/embeddings endpoint"""
+        try:
+            # Share the client-wide bound so fallback traffic respects max_concurrency too
+            async with self._request_semaphore:
                 response = await self.client.post(
                     f"{self.base_url}/api/embeddings",
                     json={
@@ -35,39 +176,67 @@ class OllamaEmbeddingClient:
                         "prompt": text
                     }
                 )
-                response.raise_for_status()
+            response.raise_for_status()
 
-                result = response.json()
-                if "embedding" in result:
-                    embeddings.append(result["embedding"])
-                else:
-                    logger.error(f"No embedding in response: {result}")
-                    embeddings.append([])
+            result = response.json()
+            if "embedding" in result:
+                embedding = np.asarray(result["embedding"], dtype=np.float32)
+                # /api/embed returns unit-length vectors but this endpoint does not; normalize so
+                # fallback results are comparable with batched ones in the same collection
+                norm = np.linalg.norm(embedding)
+                return embedding / norm if norm > 0 else embedding
+            logger.error(f"No embedding in response: {result}")
 
-            except Exception as e:
-                logger.error(f"Error generating embedding for text: {e}")
-                embeddings.append([])
+        except Exception as e:
+            logger.error(f"Error generating embedding for text: {e}")
 
-        return embeddings
+        return _EMPTY_EMBEDDING
 
-    async def health_check(self) -> bool:
-        """Check if Ollama server is healthy"""
+    async def _get_tags(self) -> Optional[Dict[str, Any]]:
+        """Get the /api/tags response, reusing a successful one for TAGS_TTL_SECONDS"""
+        now = time.monotonic()
+        if self._tags_cache is not None and now - self._tags_cache[0] < self.TAGS_TTL_SECONDS:
+            return self._tags_cache[1]
+
+        # Concurrent checks on a cold cache wait for one request instead of each sending their own
+        if self._tags_task is None:
+            self._tags_task = asyncio.ensure_future(self._fetch_tags())
+            self._tags_task.add_done_callback(self._clear_tags_task)
+        # Shielded so a cancelled caller does not cancel the fetch for the others
+        return await asyncio.shield(self._tags_task)
+
+    def _clear_tags_task(self, task: "asyncio.Future[Optional[Dict[str, Any]]]") -> None:
+        """Forget a finished /api/tags fetch so the next cache miss starts a new one"""
+        if self._tags_task is task:
+            self._tags_task = None
+
+    async def _fetch_tags(self) -> Optional[Dict[str, Any]]:
+        """Fetch /api/tags and cache a successful response"""
         try:
             response = await self.client.get(f"{self.base_url}/api/tags")
-            return response.status_code == 200
+            if response.status_code != 200:
+                logger.error(f"Ollama returned status {response.status_code} for /api/tags")
+                return None
+            tags = response.json()
         except Exception as e:
-            logger.error(f"Ollama health check failed: {e}")
-            return False
+            logger.error(f"Error fetching Ollama tags: {e}")
+            return None
+
+        self._tags_cache = (time.monotonic(), tags)
+        return tags
+
+    async def health_check(self) -> bool:
+        """Check if Ollama server is healthy"""
+        return await self._get_tags() is not None
 
     async def check_model_exists(self) -> bool:
         """Check if the embedding model exists"""
-        try:
-            response = await self.client.get(f"{self.base_url}/api/tags")
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                model_names = [model["name"] for model in models]
-                return self.model in model_names
+        tags = await self._get_tags()
+        if tags is None:
             return False
+        try:
+            model_names = [model["name"] for model in tags.get("models", [])]
+            return self.model in model_names
         except Exception as e:
             logger.error(f"Error checking model existence: {e}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,81 @@
+import time
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class SemanticSearchCache:
+    """LRU cache of recent search results, matched by cosine similarity of query embeddings"""
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 300, max_entries: int = 128):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop all cached results"""
+        # Parallel lists ordered from least to most recently used
+        self._vectors: List[np.ndarray] = []
+        self._entries: List[Tuple[float, int, List[Dict[str, Any]]]] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def _normalize(self, embedding: np.ndarray) -> Optional[np.ndarray]:
+        """L2-normalize an embedding so a dot product gives cosine similarity"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _remove(self, index: int) -> None:
+        """Remove the entry at index"""
+        del self._vectors[index]
+        del self._entries[index]
+        self._matrix = None
+
+    def get(self, embedding: np.ndarray, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Get cached results for a query close enough to a recent one, or None"""
+        query = self._normalize(embedding)
+        if query is None or not self._vectors or self._vectors[0].shape != query.shape:
+            return None
+
+        if self._matrix is None:
+            self._matrix = np.stack(self._vectors)
+
+        scores = self._matrix @ query
+        best = int(np.argmax(scores))
+        created_at, cached_limit, results = self._entries[best]
+
+        if time.monotonic() - created_at > self.ttl_seconds:
+            self._remove(best)
+            return None
+        if scores[best] < self.threshold or cached_limit < limit:
+            return None
+
+        # Mark as most recently used
+        vector = self._vectors[best]
+        entry = self._entries[best]
+        self._remove(best)
+        self._vectors.append(vector)
+        self._entries.append(entry)
+
+        logger.debug(f"Semantic search cache hit (similarity {scores[best]:.3f})")
+        return results[:limit]
+
+    def put(self, embedding: np.ndarray, limit: int, results: List[Dict[str, Any]]) -> None:
+        """Cache the results of a search"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        # Embedding dimension changed (e.g. a different model); old entries cannot be compared
+        if self._vectors and self._vectors[0].shape != vector.shape:
+            self.clear()
+
+        self._vectors.append(vector)
+        self._entries.append((time.monotonic(), limit, results))
+        self._matrix = None
+
+        while len(self._entries) > self.max_entries:
+            self._remove(0)
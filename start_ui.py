@@ -4,7 +4,7 @@ Startup script for Obsidian Vector Search Gradio UI
 """
 import sys
 import os
-import requests
+import httpx
 import time
 from pathlib import Path
 
@@ -13,29 +13,32 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from config import get_settings
 
-def check_api_connection(api_url: str, max_retries: int = 5) -> bool:
-    """Check if the API is running and accessible"""
+def check_api_connection(api_url: str, max_retries: int = 6) -> bool:
+    """Check if the API is running and accessible, retrying with exponential backoff"""
     print(f"🔍 Checking API connection at {api_url}...")
 
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(f"{api_url}/health", timeout=5)
-            if response.status_code == 200:
-                health_data = response.json()
-                print(f"✅ API is accessible")
-                print(f"   Status: {health_data.get('status', 'unknown')}")
-                print(f"   Ollama: {'✅ Connected' if health_data.get('ollama_connected') else '❌ Disconnected'}")
-                print(f"   Database: {health_data.get('database_status', 'unknown')}")
-                return True
-            else:
-                print(f"⚠️  API returned status {response.status_code}")
-
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️  Attempt {attempt + 1}/{max_retries} failed: {e}")
-
-        if attempt < max_retries - 1:
-            print("   Retrying in 2 seconds...")
-            time.sleep(2)
+    # Reuse one connection across attempts
+    with httpx.Client(timeout=5) as client:
+        for attempt in range(max_retries):
+            try:
+                response = client.get(f"{api_url}/health")
+                if response.status_code == 200:
+                    health_data = response.json()
+                    print(f"✅ API is accessible")
+                    print(f"   Status: {health_data.get('status', 'unknown')}")
+                    print(f"   Ollama: {'✅ Connected' if health_data.get('ollama_connected') else '❌ Disconnected'}")
+                    print(f"   Database: {health_data.get('database_status', 'unknown')}")
+                    return True
+                else:
+                    print(f"⚠️  API returned status {response.status_code}")
+
+            except httpx.HTTPError as e:
+                print(f"⚠️  Attempt {attempt + 1}/{max_retries} failed: {e}")
+
+            if attempt < max_retries - 1:
+                delay = min(0.25 * 2 ** attempt, 4)
+                print(f"   Retrying in {delay:g} seconds...")
+                time.sleep(delay)
 
     return False
 
@@ -0,0 +1,128 @@
+import os
+import logging
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# USearch metric matching each Chroma distance function
+_METRICS = {"l2": "l2sq", "cosine": "cos", "ip": "ip"}
+
+class USearchIndex:
+    """HNSW index persisted with USearch next to the Chroma database"""
+
+    def __init__(self, path: str, space: str = "l2", writable: bool = True):
+        # Optional dependency, only needed when the usearch backend is selected
+        from usearch.index import Index
+
+        self._index_class = Index
+        self.path = path
+        self.metric = _METRICS.get(space, "l2sq")
+        self.index = None
+        self.ids: Dict[int, str] = {}
+        self.dirty = False
+        # Present while the saved file is behind the in-memory index, e.g. after a crash
+        self._dirty_marker = f"{path}.dirty"
+        # Only the instance owning the directory saves the index; others mark it stale when they write to Chroma
+        self.writable = writable
+        self._stale_marker = f"{path}.stale"
+
+    @staticmethod
+    def _key(doc_id: str) -> int:
+        """Map a hex document ID to a USearch integer key"""
+        return int(doc_id[:16], 16)
+
+    def load(self, doc_ids: List[str], load_embeddings: Callable[[], Tuple[List[str], np.ndarray]]) -> None:
+        """Open the saved index, rebuilding it from stored embeddings when it is missing or stale"""
+        self.ids = {self._key(doc_id): doc_id for doc_id in doc_ids}
+
+        if (os.path.exists(self.path) and not os.path.exists(self._dirty_marker) and
+                not os.path.exists(self._stale_marker)):
+            index = self._index_class.restore(self.path)
+            if index is not None and len(index) == len(self.ids):
+                self.index = index
+                logger.info(f"Loaded USearch index with {len(index)} documents")
+                return
+
+        logger.info("Rebuilding USearch index from stored embeddings")
+        self.index = None
+        # Cleared before reading, so writes by other instances from here on mark the rebuilt index stale again
+        if self.writable and os.path.exists(self._stale_marker):
+            os.remove(self._stale_marker)
+        ids, embeddings = load_embeddings()
+        self.upsert(ids, embeddings)
+        self.save()
+
+    def _new_index(self, ndim: int):
+        """Create an empty index for vectors of the given dimension"""
+        return self._index_class(
+            ndim=ndim,
+            metric=self.metric,
+            dtype="f32",
+            connectivity=16,
+            expansion_add=64,
+            expansion_search=100
+        )
+
+    def _mark_dirty(self) -> None:
+        """Record that the saved index no longer matches the in-memory one"""
+        if not self.writable:
+            # Touched on every write, since the owner clears it whenever it rebuilds
+            open(self._stale_marker, "a").close()
+            return
+        if not self.dirty:
+            open(self._dirty_marker, "w").close()
+            self.dirty = True
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray) -> None:
+        """Add or replace the vectors for the given document IDs"""
+        if not ids:
+            return
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        if self.index is None or self.index.ndim != embeddings.shape[1]:
+            if self.index is not None:
+                logger.warning("Embedding dimension changed, rebuilding USearch index")
+            self.index = self._new_index(embeddings.shape[1])
+
+        keys = np.array([self._key(doc_id) for doc_id in ids], dtype=np.uint64)
+        existing = keys[np.asarray(self.index.contains(keys), dtype=bool)]
+        if len(existing):
+            self.index.remove(existing)
+        self.index.add(keys, embeddings)
+        self.ids.update(zip(keys.tolist(), ids))
+        self._mark_dirty()
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove the vectors for the given document IDs"""
+        if self.index is None:
+            return
+        keys = np.array([self._key(doc_id) for doc_id in ids], dtype=np.uint64)
+        keys = keys[np.asarray(self.index.contains(keys), dtype=bool)]
+        if not len(keys):
+            return
+        self.index.remove(keys)
+        for key in keys.tolist():
+            self.ids.pop(key, None)
+        self._mark_dirty()
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Get the IDs and distances of the k nearest documents"""
+        if self.index is None or not len(self.index):
+            return []
+        matches = self.index.search(np.asarray(query, dtype=np.float32), min(k, len(self.index)))
+        return [
+            (self.ids[key], float(distance))
+            for key, distance in zip(matches.keys.tolist(), matches.distances.tolist())
+            if key in self.ids
+        ]
+
+    def save(self) -> None:
+        """Write the index to disk if it changed since it was loaded or last saved"""
+        if self.index is None or not self.dirty or not self.writable:
+            return
+        self.index.save(self.path)
+        if os.path.exists(self._dirty_marker):
+            os.remove(self._dirty_marker)
+        self.dirty = False
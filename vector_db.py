@@ -1,107 +1,508 @@
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple, Union
+import os
+import asyncio
 import logging
-import hashlib
+import sqlite3
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from blake3 import blake3
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (e.g. Windows): every instance acts as the owner of the index files
+    fcntl = None
+
+from local_index import LocalVectorIndex, compute_distances, kmeans, nearest_centroids
+from usearch_index import USearchIndex
+from vector_store import MemmapVectorStore
 
 logger = logging.getLogger(__name__)
 
+# Number of documents sent to Chroma per upsert call
+BATCH_SIZE = 128
+
+# Shared worker pool for preparing and writing upsert batches
+_UPSERT_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chroma-upsert")
+
+# Chroma clients and collections shared by every VectorDatabase in the process, keyed by
+# persist directory, so opening the same database again skips client setup and collection lookup
+_CLIENTS: Dict[str, Any] = {}
+_COLLECTIONS: Dict[Tuple[str, str], Any] = {}
+# Chroma's local client is not safe for concurrent writes to one collection
+_WRITE_LOCKS: Dict[str, threading.Lock] = {}
+_CLIENTS_LOCK = threading.Lock()
+# Recent get_document_by_path results per shared collection, least recently used first, as
+# file path -> (expiry time, id, stored content, metadata, whether content was fetched)
+_DOC_CACHES: Dict[Tuple[str, str], Dict[str, Tuple[float, str, Optional[str], Dict[str, Any], bool]]] = {}
+_DOC_CACHE_LOCK = threading.Lock()
+
+# Queries against Chroma's SQLite metadata segment (chromadb 0.4.x schema), avoiding
+# materializing every metadata dict just to read a few keys
+_METADATA_IDS_SQL = """
+    SELECT e.id FROM embeddings e
+    JOIN segments s ON s.id = e.segment_id
+    WHERE s.collection = ? AND s.scope = 'METADATA'
+"""
+_FILE_PATHS_SQL = f"""
+    SELECT string_value FROM embedding_metadata
+    WHERE key = 'file_path' AND id IN ({_METADATA_IDS_SQL})
+"""
+_FILE_MTIMES_SQL = f"""
+    SELECT fp.string_value, tc.int_value, COALESCE(mt.float_value, mt.int_value, mt.string_value)
+    FROM embedding_metadata fp
+    LEFT JOIN embedding_metadata tc ON tc.id = fp.id AND tc.key = 'total_chunks'
+    LEFT JOIN embedding_metadata mt ON mt.id = fp.id AND mt.key = 'modified_at'
+    WHERE fp.key = 'file_path' AND fp.id IN ({_METADATA_IDS_SQL})
+"""
+
+def _lock_index_files(persist_directory: str):
+    """Try to become the single owner of the index files in a directory, returning the held lock file or None"""
+    lock_file = open(os.path.join(persist_directory, "index.lock"), "a")
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except OSError:
+        lock_file.close()
+        return None
+
+@lru_cache(maxsize=256)
+def _read_source_file(path: str, mtime_ns: int, size: int) -> Tuple[str, str]:
+    """Read a vault file and its content hash, cached until its modification time or size changes"""
+    with open(path, "rb") as f:
+        data = f.read()
+    # Same digest the indexer stores as content_hash
+    return data.decode("utf-8"), blake3(data).hexdigest(length=16)
+
 class VectorDatabase:
     """Chroma vector database wrapper for document storage and search"""
 
-    def __init__(self, persist_directory: str):
+    # Recorded in the collection metadata so collections keyed by older MD5 IDs get migrated
+    ID_SCHEME = "blake3"
+    MIGRATION_BATCH_SIZE = 500
+
+    # IDs per Chroma get or delete call, keeping the statement within SQLite's bound parameter limit
+    ID_BATCH_SIZE = 5000
+
+    # Number of get_document_by_path results kept in memory, and how long one is trusted, since
+    # another process (e.g. the MCP server next to the API server) may write to the same database
+    DOC_CACHE_SIZE = 1024
+    DOC_CACHE_TTL_SECONDS = 5.0
+
+    # Candidates pulled from the quantized index per requested result, reranked with full embeddings
+    RERANK_FACTOR = 8
+
+    # SQLite settings trading crash safety for insert throughput, and the safe settings restored afterwards
+    FAST_INSERT_PRAGMAS = ("journal_mode=OFF", "synchronous=OFF", "temp_store=MEMORY", "cache_size=-200000")
+    DURABLE_PRAGMAS = ("journal_mode=WAL", "synchronous=NORMAL")
+
+    def __init__(self, persist_directory: str, batch_size: int = BATCH_SIZE, quantization: str = "none",
+                 backend: str = "chroma", fast_insert_mode: bool = False, ivf_clusters: int = 0,
+                 ivf_probe: int = 8, store_content: bool = True):
+        if quantization not in ("none", "int8", "binary"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        if backend not in ("chroma", "usearch", "flat"):
+            raise ValueError(f"Unsupported vector backend: {backend}")
+        if backend == "usearch" and quantization != "none":
+            raise ValueError("Quantization is not supported with the usearch backend")
         self.persist_directory = persist_directory
-        self.client = chromadb.PersistentClient(
-            path=persist_directory,
-            settings=ChromaSettings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
+        self.batch_size = max(1, batch_size)
+        self.quantization = quantization
+        # When disabled, chunk text is not duplicated into Chroma and is read back from the vault on demand
+        self.store_content = store_content
+        # Brute-force search over an in-memory copy of the embeddings, quantized or exact float32
+        self.use_local_index = backend == "flat" or quantization != "none"
+        # Coarse k-means partition used to restrict Chroma searches to the clusters nearest the query
+        self.ivf_clusters = max(0, ivf_clusters)
+        self.ivf_probe = max(1, ivf_probe)
+        self._centroids_path = os.path.join(persist_directory, "centroids.npy")
+        self._centroids: Optional[np.ndarray] = None
+        if self.ivf_clusters and os.path.exists(self._centroids_path):
+            self._centroids = np.load(self._centroids_path)
+        # In-memory copy of the stored embeddings, built on the first local search
+        self._local_index: Optional[LocalVectorIndex] = None
+        self._index_lock = threading.Lock()
+        # Chroma opens one SQLite connection per thread, so pragmas are applied per thread on first write
+        self._sqlite_mode: Optional[str] = "fast" if fast_insert_mode else None
+        self._thread_state = threading.local()
         self.collection_name = "obsidian_documents"
-        self.collection = self._get_or_create_collection()
+        with _CLIENTS_LOCK:
+            key = os.path.abspath(persist_directory)
+            self.client = _CLIENTS.get(key)
+            if self.client is None:
+                self.client = _CLIENTS[key] = chromadb.PersistentClient(
+                    path=persist_directory,
+                    settings=ChromaSettings(
+                        anonymized_telemetry=False,
+                        allow_reset=True
+                    )
+                )
+            self._upsert_lock = _WRITE_LOCKS.setdefault(key, threading.Lock())
+            self.collection = _COLLECTIONS.get((key, self.collection_name))
+            if self.collection is None:
+                self.collection = _COLLECTIONS[(key, self.collection_name)] = self._get_or_create_collection()
+            self._doc_cache = _DOC_CACHES.setdefault((key, self.collection_name), {})
+
+        # Index files are written by one instance per directory, across processes, so instances
+        # sharing a database never overwrite each other's rows; the others keep their index in memory
+        self._index_files_lock = None
+        if self.use_local_index or backend == "usearch":
+            self._index_files_lock = _lock_index_files(persist_directory)
+            if self._index_files_lock is None:
+                logger.info("Index files are owned by another instance, keeping the search index in memory only")
+        writable = self._index_files_lock is not None
+
+        # Embeddings mirrored into a memory-mapped file, so the local index loads without reading them back from Chroma
+        self._vector_store = MemmapVectorStore(persist_directory, writable) if self.use_local_index else None
+
+        # Chroma keeps documents and metadata; USearch answers nearest-neighbour queries
+        self._usearch: Optional[USearchIndex] = None
+        if backend == "usearch":
+            self._usearch = USearchIndex(os.path.join(persist_directory, "usearch.idx"), self._distance_space(), writable)
+            self._usearch.load(self.collection.get(include=[])["ids"], self._load_all_embeddings)
+
+    def close(self) -> None:
+        """Persist in-memory index state and restore durable SQLite settings"""
+        if self._usearch:
+            with self._index_lock:
+                self._usearch.save()
+        if self._index_files_lock is not None:
+            self._index_files_lock.close()
+            self._index_files_lock = None
+            # Any later writes only mark the files stale for the next owner
+            if self._vector_store:
+                self._vector_store.writable = False
+            if self._usearch:
+                self._usearch.writable = False
+        if self._sqlite_mode == "fast":
+            self.durable_mode()
+
+    def _prepare_connection(self) -> None:
+        """Apply the current SQLite pragmas to this thread's Chroma connection"""
+        mode = self._sqlite_mode
+        if mode is None or getattr(self._thread_state, "sqlite_mode", None) == mode:
+            return
+
+        pragmas = self.FAST_INSERT_PRAGMAS if mode == "fast" else self.DURABLE_PRAGMAS
+        try:
+            # Private chromadb API; pragmas cannot be changed inside the transactions tx() opens
+            conn = self.client._server._sysdb._conn_pool.connect()
+            for pragma in pragmas:
+                conn.execute(f"PRAGMA {pragma}").fetchall()
+        except Exception as e:
+            logger.warning(f"Could not apply SQLite pragmas: {e}")
+        self._thread_state.sqlite_mode = mode
+
+    def durable_mode(self) -> None:
+        """Switch back from fast insert mode to WAL journaling with normal syncs and checkpoint the WAL"""
+        self._sqlite_mode = "durable"
+        self._prepare_connection()
+        try:
+            conn = sqlite3.connect(os.path.join(self.persist_directory, "chroma.sqlite3"))
+            try:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Could not checkpoint SQLite WAL: {e}")
+
+    def _assign_clusters(self, embeddings: np.ndarray) -> Optional[np.ndarray]:
+        """Get the partition of each embedding, or None when no partition has been built"""
+        centroids = self._centroids
+        if centroids is None or embeddings.shape[1] != centroids.shape[1]:
+            return None
+        return nearest_centroids(embeddings, centroids)
+
+    def _partition_filter(self, query: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Get a where filter selecting the ivf_probe partitions nearest the query"""
+        centroids = self._centroids
+        if centroids is None or self.ivf_probe >= len(centroids) or query.shape[0] != centroids.shape[1]:
+            return None
+        distances = compute_distances(centroids, query)
+        nearest = np.argpartition(distances, self.ivf_probe - 1)[:self.ivf_probe]
+        return {"cluster_id": {"$in": [int(cluster) for cluster in nearest]}}
+
+    def build_partitions(self) -> None:
+        """Cluster all stored embeddings with k-means and tag each document with its partition"""
+        if not self.ivf_clusters:
+            return
+        try:
+            ids, embeddings = self._load_all_embeddings()
+            if len(ids) < self.ivf_clusters:
+                logger.info(f"Not partitioning {len(ids)} documents into {self.ivf_clusters} clusters")
+                return
+
+            centroids = kmeans(embeddings, self.ivf_clusters)
+            clusters = nearest_centroids(embeddings, centroids)
+            for start in range(0, len(ids), self.batch_size):
+                end = start + self.batch_size
+                with self._upsert_lock:
+                    self._prepare_connection()
+                    self.collection.update(
+                        ids=ids[start:end],
+                        metadatas=[{"cluster_id": int(cluster)} for cluster in clusters[start:end]]
+                    )
+            # Cached metadata no longer has the current cluster IDs
+            with _DOC_CACHE_LOCK:
+                self._doc_cache.clear()
+
+            with open(self._centroids_path, "wb") as f:
+                np.save(f, centroids)
+            self._centroids = centroids
+            logger.info(f"Partitioned {len(ids)} documents into {len(centroids)} clusters")
+        except Exception as e:
+            logger.error(f"Error building partitions: {e}")
 
     def _get_or_create_collection(self):
         """Get or create the documents collection"""
         try:
-            return self.client.get_collection(name=self.collection_name)
+            collection = self.client.get_collection(name=self.collection_name)
         except ValueError:
             return self.client.create_collection(
                 name=self.collection_name,
-                metadata={"description": "Obsidian vault documents"}
+                metadata={"description": "Obsidian vault documents", "id_scheme": self.ID_SCHEME}
             )
 
-    def _generate_document_id(self, file_path: str) -> str:
+        if (collection.metadata or {}).get("id_scheme") != self.ID_SCHEME:
+            self._migrate_document_ids(collection)
+        return collection
+
+    def _migrate_document_ids(self, collection) -> None:
+        """Re-key documents stored under IDs from an older ID scheme"""
+        try:
+            old_ids = collection.get(include=[])["ids"]
+            if old_ids:
+                logger.info(f"Migrating {len(old_ids)} document IDs to {self.ID_SCHEME}")
+
+            for i in range(0, len(old_ids), self.MIGRATION_BATCH_SIZE):
+                batch = collection.get(
+                    ids=old_ids[i:i + self.MIGRATION_BATCH_SIZE],
+                    include=["embeddings", "metadatas", "documents"]
+                )
+                keep = [j for j, metadata in enumerate(batch["metadatas"]) if metadata and "file_path" in metadata]
+                if not keep:
+                    continue
+
+                new_ids = [self._generate_document_id(batch["metadatas"][j]["file_path"]) for j in keep]
+                collection.upsert(
+                    ids=new_ids,
+                    embeddings=[batch["embeddings"][j] for j in keep],
+                    metadatas=[batch["metadatas"][j] for j in keep],
+                    documents=[batch["documents"][j] for j in keep]
+                )
+                stale_ids = [batch["ids"][j] for j, new_id in zip(keep, new_ids) if batch["ids"][j] != new_id]
+                if stale_ids:
+                    collection.delete(ids=stale_ids)
+
+            collection.modify(metadata={**(collection.metadata or {}), "id_scheme": self.ID_SCHEME})
+        except Exception as e:
+            logger.error(f"Error migrating document IDs: {e}")
+
+    def _distance_space(self) -> str:
+        """Get the distance function the collection was created with"""
+        return (self.collection.metadata or {}).get("hnsw:space", "l2")
+
+    def _load_all_embeddings(self) -> Tuple[List[str], np.ndarray]:
+        """Load the IDs and embeddings of every stored document"""
+        stored = self.collection.get(include=["embeddings"])
+        return stored["ids"], np.asarray(stored["embeddings"] or [], dtype=np.float32)
+
+    def _get_local_index(self) -> LocalVectorIndex:
+        """Get the local index, loading it from the stored embeddings on first use"""
+        with self._index_lock:
+            if self._local_index is None:
+                index = LocalVectorIndex(self.quantization, self._distance_space())
+                if self._vector_store:
+                    index.upsert(*self._vector_store.load(self.collection.get(include=[])["ids"],
+                                                          self._load_all_embeddings))
+                else:
+                    index.upsert(*self._load_all_embeddings())
+                logger.info(f"Built {self.quantization} vector index with {len(index)} documents")
+                self._local_index = index
+            return self._local_index
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def _generate_document_id(file_path: str) -> str:
         """Generate a unique document ID from file path"""
-        return hashlib.md5(file_path.encode()).hexdigest()
+        return blake3(file_path.encode()).hexdigest(length=16)
+
+    def _document_hash(self, doc: Dict[str, Any], embedding: np.ndarray) -> str:
+        """Hash what an upsert writes besides metadata: the text, whether it is stored, and the embedding"""
+        hasher = blake3(doc["content"].encode())
+        hasher.update(b"\x01" if self.store_content else b"\x00")
+        hasher.update(embedding.tobytes())
+        return hasher.hexdigest(length=16)
+
+    def _find_unchanged(self, ids: List[str], hashes: List[str]) -> Set[str]:
+        """Get the IDs whose stored document hash matches, with one Chroma get per ID_BATCH_SIZE IDs"""
+        try:
+            stored = {}
+            for i in range(0, len(ids), self.ID_BATCH_SIZE):
+                existing = self.collection.get(ids=ids[i:i + self.ID_BATCH_SIZE], include=["metadatas"])
+                stored.update(zip(existing["ids"], (
+                    metadata.get("document_hash") if metadata else None for metadata in existing["metadatas"]
+                )))
+            return {doc_id for doc_id, doc_hash in zip(ids, hashes) if stored.get(doc_id) == doc_hash}
+        except Exception as e:
+            logger.error(f"Error checking for unchanged documents: {e}")
+            return set()
 
     def add_documents(self, documents: List[Dict[str, Any]]) -> None:
         """Add multiple documents to the vector database
 
         Args:
             documents: List of dicts with keys: file_path, content, metadata, embedding
+                (embedding should be a float32 numpy array as produced by the embedding client)
         """
         if not documents:
             return
 
-        ids = []
-        embeddings = []
-        metadatas = []
-        documents_content = []
+        ids = [self._generate_document_id(doc["file_path"]) for doc in documents]
+        # One contiguous (n, d) float32 matrix allocated up front, filled row by row
+        embeddings = np.empty((len(documents), len(documents[0]["embedding"])), dtype=np.float32)
+        for i, doc in enumerate(documents):
+            embeddings[i] = doc["embedding"]
+
+        # Chunks whose text and embedding are already stored, e.g. the untouched chunks of an edited note
+        hashes = [self._document_hash(doc, embeddings[i]) for i, doc in enumerate(documents)]
+        unchanged = self._find_unchanged(ids, hashes)
 
-        for doc in documents:
-            doc_id = self._generate_document_id(doc["file_path"])
-            ids.append(doc_id)
-            embeddings.append(doc["embedding"])
+        # Pre-sized column lists filled by index rather than grown by appending
+        metadatas: List[Optional[Dict[str, Any]]] = [None] * len(documents)
+        # Empty documents overwrite any text stored before content storage was turned off
+        documents_content: List[Optional[str]] = [None if self.store_content else ""] * len(documents)
+        # All documents in one call share the same indexing timestamp
+        indexed_at = datetime.now().isoformat()
+        clusters = self._assign_clusters(embeddings)
 
+        for i, doc in enumerate(documents):
             metadata = {
                 "file_path": doc["file_path"],
-                "indexed_at": datetime.now().isoformat(),
+                "indexed_at": indexed_at,
+                "document_hash": hashes[i],
                 **doc.get("metadata", {})
             }
-            metadatas.append(metadata)
-            documents_content.append(doc["content"])
+            if clusters is not None:
+                metadata["cluster_id"] = int(clusters[i])
+            metadatas[i] = metadata
+            if self.store_content:
+                documents_content[i] = doc["content"]
+
+        # Unchanged chunks only get their metadata merged; the rest are upserted with their vectors
+        refresh = [i for i, doc_id in enumerate(ids) if doc_id in unchanged]
+        if refresh:
+            logger.info(f"Skipping vector upsert for {len(refresh)} unchanged documents")
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in unchanged]
+            cached_documents = list(zip(documents, ids, documents_content, metadatas))
+            refresh_ids = [ids[i] for i in refresh]
+            refresh_metadatas = [metadatas[i] for i in refresh]
+            documents = [documents[i] for i in keep]
+            ids = [ids[i] for i in keep]
+            metadatas = [metadatas[i] for i in keep]
+            documents_content = [documents_content[i] for i in keep]
+            embeddings = embeddings[keep]
+        else:
+            cached_documents = list(zip(documents, ids, documents_content, metadatas))
+            refresh_ids = refresh_metadatas = []
+
+        def upsert_batch(start: int) -> None:
+            end = start + self.batch_size
+            # Chroma validates embeddings as lists of Python floats
+            batch_embeddings = embeddings[start:end].tolist()
+            with self._upsert_lock:
+                self._prepare_connection()
+                self.collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=batch_embeddings,
+                    metadatas=metadatas[start:end],
+                    documents=documents_content[start:end]
+                )
 
         try:
-            self.collection.upsert(
-                ids=ids,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                documents=documents_content
-            )
-            logger.info(f"Added {len(documents)} documents to vector database")
+            for start in range(0, len(refresh_ids), self.batch_size):
+                with self._upsert_lock:
+                    self._prepare_connection()
+                    self.collection.update(
+                        ids=refresh_ids[start:start + self.batch_size],
+                        metadatas=refresh_metadatas[start:start + self.batch_size]
+                    )
+
+            starts = range(0, len(ids), self.batch_size)
+            if len(starts) == 1:
+                upsert_batch(0)
+            elif starts:
+                # Convert the next batches while the current one is being written
+                for future in [_UPSERT_EXECUTOR.submit(upsert_batch, start) for start in starts]:
+                    future.result()
+            # Refresh cached lookups of the paths just written
+            with _DOC_CACHE_LOCK:
+                for doc, doc_id, content, metadata in cached_documents:
+                    if doc["file_path"] in self._doc_cache:
+                        self._doc_cache[doc["file_path"]] = (
+                            time.monotonic() + self.DOC_CACHE_TTL_SECONDS, doc_id, content, metadata, True
+                        )
+            with self._index_lock:
+                if self._vector_store:
+                    self._vector_store.upsert(ids, embeddings)
+                if self._local_index is not None:
+                    self._local_index.upsert(ids, embeddings)
+                if self._usearch:
+                    self._usearch.upsert(ids, embeddings)
+            if ids:
+                logger.info(f"Added {len(documents)} documents to vector database")
         except Exception as e:
             logger.error(f"Error adding documents to vector database: {e}")
             raise
 
-    def search(self, query_embedding: List[float], n_results: int = 10) -> Dict[str, Any]:
+    def search(self, query_embedding: Union[np.ndarray, List[float]], n_results: int = 10) -> Dict[str, Any]:
         """Search for similar documents
 
         Args:
-            query_embedding: Query vector
+            query_embedding: Query vector, ideally a float32 numpy array from the embedding client
             n_results: Number of results to return
 
         Returns:
             Dictionary with search results
         """
         try:
+            # Convert once; float32 input is used as-is without copying
+            query = np.ascontiguousarray(query_embedding, dtype=np.float32).reshape(-1)
+            if self._usearch:
+                return self._search_usearch(query, n_results)
+            if self.use_local_index:
+                return self._search_local(query, n_results)
+
             results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results
+                # Chroma 0.4.18 only accepts embeddings as lists of Python floats
+                query_embeddings=[query.tolist()],
+                n_results=n_results,
+                where=self._partition_filter(query)
             )
 
             # Format results
-            formatted_results = []
-            if results and results["ids"] and results["ids"][0]:
-                for i, doc_id in enumerate(results["ids"][0]):
-                    formatted_results.append({
-                        "id": doc_id,
-                        "content": results["documents"][0][i] if results["documents"] else "",
-                        "metadata": results["metadatas"][0][i] if results["metadatas"] else {},
-                        "distance": results["distances"][0][i] if results["distances"] else 0.0
-                    })
+            ids = results["ids"][0] if results and results["ids"] else []
+            if not ids:
+                return {"results": [], "total_results": 0}
+
+            count = len(ids)
+            contents = results["documents"][0] if results["documents"] else [""] * count
+            metadatas = results["metadatas"][0] if results["metadatas"] else [{}] * count
+            distances = results["distances"][0] if results["distances"] else [0.0] * count
+            formatted_results = [
+                {"id": doc_id, "content": self._resolve_content(content, metadata), "metadata": metadata,
+                 "distance": distance}
+                for doc_id, content, metadata, distance in zip(ids, contents, metadatas, distances)
+            ]
 
             return {
                 "results": formatted_results,
@@ -112,39 +513,211 @@ class VectorDatabase:
             logger.error(f"Error searching vector database: {e}")
             return {"results": [], "total_results": 0}
 
-    def get_document_by_path(self, file_path: str) -> Optional[Dict[str, Any]]:
-        """Get a document by file path"""
-        doc_id = self._generate_document_id(file_path)
+    async def asearch(self, query_embedding: Union[np.ndarray, List[float]], n_results: int = 10) -> Dict[str, Any]:
+        """Search for similar documents in a worker thread so the event loop stays responsive"""
+        return await asyncio.to_thread(self.search, query_embedding, n_results)
+
+    def _search_local(self, query: np.ndarray, n_results: int) -> Dict[str, Any]:
+        """Search the in-memory index, reranking quantized candidates with their full embeddings"""
+        index = self._get_local_index()
+        if self.quantization == "none":
+            # Exact float32 distances, no reranking needed
+            with self._index_lock:
+                matches = index.search(query, n_results)
+            return self._format_matches(matches)
+
+        with self._index_lock:
+            candidates = [doc_id for doc_id, _ in index.search(query, n_results * self.RERANK_FACTOR)]
+        if not candidates:
+            return {"results": [], "total_results": 0}
+
+        stored = self.collection.get(ids=candidates, include=["embeddings", "documents", "metadatas"])
+        distances = compute_distances(np.asarray(stored["embeddings"], dtype=np.float32), query, self._distance_space())
+        top = np.argsort(distances, kind="stable")[:n_results]
+
+        formatted_results = []
+        for i in top:
+            metadata = stored["metadatas"][i] if stored["metadatas"] else {}
+            formatted_results.append({
+                "id": stored["ids"][i],
+                "content": self._resolve_content(stored["documents"][i] if stored["documents"] else "", metadata),
+                "metadata": metadata,
+                "distance": float(distances[i])
+            })
+        return {
+            "results": formatted_results,
+            "total_results": len(formatted_results)
+        }
+
+    def _search_usearch(self, query: np.ndarray, n_results: int) -> Dict[str, Any]:
+        """Search the USearch index, then fetch the matching documents from Chroma"""
+        with self._index_lock:
+            matches = self._usearch.search(query, n_results)
+        return self._format_matches(matches)
+
+    def _format_matches(self, matches: List[Tuple[str, float]]) -> Dict[str, Any]:
+        """Fetch the documents for ranked (id, distance) matches from Chroma"""
+        if not matches:
+            return {"results": [], "total_results": 0}
+
+        stored = self.collection.get(ids=[doc_id for doc_id, _ in matches], include=["documents", "metadatas"])
+        rows = {doc_id: i for i, doc_id in enumerate(stored["ids"])}
+
+        formatted_results = []
+        for doc_id, distance in matches:
+            if doc_id not in rows:
+                continue
+            metadata = stored["metadatas"][rows[doc_id]] if stored["metadatas"] else {}
+            formatted_results.append({
+                "id": doc_id,
+                "content": self._resolve_content(stored["documents"][rows[doc_id]] if stored["documents"] else "", metadata),
+                "metadata": metadata,
+                "distance": distance
+            })
+        return {
+            "results": formatted_results,
+            "total_results": len(formatted_results)
+        }
+
+    def _resolve_content(self, content: Optional[str], metadata: Dict[str, Any]) -> str:
+        """Get a chunk's text, reading it from the vault file when it was not stored in Chroma"""
+        # Text stored before content storage was turned off may be out of date, so prefer the vault file
+        if "chunk_start" not in metadata or (content and self.store_content):
+            return content or ""
+
+        file_path = metadata.get("file_path", "")
+        if metadata.get("total_chunks", 1) > 1:
+            file_path = file_path.rsplit("#", 1)[0]
         try:
-            results = self.collection.get(
-                ids=[doc_id],
-                include=["documents", "metadatas"]
+            stat = os.stat(file_path)
+            text, content_hash = _read_source_file(file_path, stat.st_mtime_ns, stat.st_size)
+            if metadata.get("content_hash", content_hash) != content_hash:
+                # The chunk offsets describe an older version of the file
+                logger.warning(f"File changed since it was indexed, content unavailable until reindexing: {file_path}")
+                return ""
+            return text[metadata["chunk_start"]:metadata["chunk_end"]]
+        except Exception as e:
+            logger.error(f"Error reading content from {file_path}: {e}")
+            return ""
+
+    def get_document_by_path(self, file_path: str, include_content: bool = True) -> Optional[Dict[str, Any]]:
+        """Get a document by file path, served from the document cache when possible"""
+        now = time.monotonic()
+        with _DOC_CACHE_LOCK:
+            cached = self._doc_cache.pop(file_path, None)
+            if cached is not None and cached[0] > now:
+                # Move to the most recently used end
+                self._doc_cache[file_path] = cached
+            else:
+                cached = None
+
+        if cached is None or (include_content and not cached[4]):
+            try:
+                results = self.collection.get(
+                    ids=[self._generate_document_id(file_path)],
+                    include=["documents", "metadatas"] if include_content else ["metadatas"]
+                )
+            except Exception as e:
+                logger.error(f"Error getting document by path {file_path}: {e}")
+                return None
+
+            # Misses are not cached, so documents written elsewhere show up on the next call
+            if not results["ids"]:
+                return None
+            cached = (
+                now + self.DOC_CACHE_TTL_SECONDS,
+                results["ids"][0],
+                results["documents"][0] if results["documents"] else None,
+                results["metadatas"][0] if results["metadatas"] else {},
+                include_content
             )
+            with _DOC_CACHE_LOCK:
+                self._doc_cache.pop(file_path, None)
+                self._doc_cache[file_path] = cached
+                if len(self._doc_cache) > self.DOC_CACHE_SIZE:
+                    del self._doc_cache[next(iter(self._doc_cache))]
 
-            if results["ids"]:
-                return {
-                    "id": results["ids"][0],
-                    "content": results["documents"][0] if results["documents"] else "",
-                    "metadata": results["metadatas"][0] if results["metadatas"] else {}
-                }
-            return None
+        _, doc_id, content, metadata, _ = cached
+        return {
+            "id": doc_id,
+            "content": self._resolve_content(content, metadata) if include_content else "",
+            # Callers may modify the result without corrupting the cached entry
+            "metadata": dict(metadata)
+        }
+
+    def update_documents_metadata(self, file_paths: List[str], metadata: Dict[str, Any]) -> bool:
+        """Merge the given metadata keys into several stored documents, leaving their vectors untouched"""
+        if not file_paths:
+            return True
+
+        doc_ids = [self._generate_document_id(file_path) for file_path in file_paths]
+        try:
+            with self._upsert_lock:
+                self._prepare_connection()
+                for i in range(0, len(doc_ids), self.ID_BATCH_SIZE):
+                    batch = doc_ids[i:i + self.ID_BATCH_SIZE]
+                    self.collection.update(ids=batch, metadatas=[metadata] * len(batch))
+            with _DOC_CACHE_LOCK:
+                for file_path in file_paths:
+                    self._doc_cache.pop(file_path, None)
+            return True
         except Exception as e:
-            logger.error(f"Error getting document by path {file_path}: {e}")
-            return None
+            logger.error(f"Error updating metadata of documents {file_paths[:5]}: {e}")
+            return False
 
     def delete_document(self, file_path: str) -> bool:
         """Delete a document by file path"""
-        doc_id = self._generate_document_id(file_path)
+        return self.delete_documents([file_path])
+
+    def delete_documents(self, file_paths: List[str]) -> bool:
+        """Delete several documents by file path with one Chroma delete per ID_BATCH_SIZE paths"""
+        if not file_paths:
+            return True
+
+        doc_ids = [self._generate_document_id(file_path) for file_path in file_paths]
         try:
-            self.collection.delete(ids=[doc_id])
-            logger.info(f"Deleted document: {file_path}")
+            with self._upsert_lock:
+                self._prepare_connection()
+                for i in range(0, len(doc_ids), self.ID_BATCH_SIZE):
+                    self.collection.delete(ids=doc_ids[i:i + self.ID_BATCH_SIZE])
+            with self._index_lock:
+                if self._vector_store:
+                    self._vector_store.remove(doc_ids)
+                if self._local_index is not None:
+                    self._local_index.remove(doc_ids)
+                if self._usearch:
+                    self._usearch.remove(doc_ids)
+            with _DOC_CACHE_LOCK:
+                for file_path in file_paths:
+                    self._doc_cache.pop(file_path, None)
+            if len(file_paths) == 1:
+                logger.info(f"Deleted document: {file_paths[0]}")
+            else:
+                logger.info(f"Deleted {len(file_paths)} documents")
             return True
         except Exception as e:
-            logger.error(f"Error deleting document {file_path}: {e}")
+            logger.error(f"Error deleting documents {file_paths[:5]}: {e}")
             return False
 
+    def _fetch_metadata_rows(self, sql: str) -> Iterator[tuple]:
+        """Stream the rows of a query against Chroma's SQLite metadata for this collection"""
+        # Private chromadb API; callers fall back to collection.get if it changes
+        sysdb = self.client._server._sysdb
+        with sysdb.tx() as cur:
+            cur.execute(sql, (str(self.collection.id),))
+            while True:
+                rows = cur.fetchmany(1000)
+                if not rows:
+                    break
+                yield from rows
+
     def get_all_document_paths(self) -> List[str]:
         """Get all indexed document file paths"""
+        try:
+            return [file_path for (file_path,) in self._fetch_metadata_rows(_FILE_PATHS_SQL)]
+        except Exception as e:
+            logger.warning(f"Direct metadata query failed, falling back to collection scan: {e}")
+
         try:
             results = self.collection.get(include=["metadatas"])
             paths = []
@@ -157,6 +730,36 @@ class VectorDatabase:
             logger.error(f"Error getting all document paths: {e}")
             return []
 
+    def get_all_paths_with_mtime(self) -> Dict[str, Any]:
+        """Get the stored modification time of every indexed file, keyed by file path"""
+        try:
+            mtimes = {}
+            for file_path, total_chunks, modified_at in self._fetch_metadata_rows(_FILE_MTIMES_SQL):
+                # Chunked files are stored as "<path>#<index>"
+                if (total_chunks or 1) > 1:
+                    file_path = file_path.rsplit('#', 1)[0]
+                mtimes[file_path] = modified_at
+            return mtimes
+        except Exception as e:
+            logger.warning(f"Direct metadata query failed, falling back to collection scan: {e}")
+
+        try:
+            results = self.collection.get(include=["metadatas"])
+            mtimes = {}
+            if results["metadatas"]:
+                for metadata in results["metadatas"]:
+                    file_path = metadata.get("file_path")
+                    if file_path is None:
+                        continue
+                    # Chunked files are stored as "<path>#<index>"
+                    if metadata.get("total_chunks", 1) > 1:
+                        file_path = file_path.rsplit('#', 1)[0]
+                    mtimes[file_path] = metadata.get("modified_at")
+            return mtimes
+        except Exception as e:
+            logger.error(f"Error getting document modification times: {e}")
+            return {}
+
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the collection"""
         try:
@@ -0,0 +1,153 @@
+import os
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Width of the fixed-size ID records, matching VectorDatabase's 32-character hex document IDs
+ID_WIDTH = 32
+
+class MemmapVectorStore:
+    """Append-only float32 embedding file, memory-mapped to load the in-memory search indexes"""
+
+    def __init__(self, directory: str, writable: bool = True):
+        self.embeddings_path = os.path.join(directory, "embeddings.bin")
+        self.ids_path = os.path.join(directory, "ids.bin")
+        self.meta_path = os.path.join(directory, "embeddings.json")
+        # Only the instance owning the directory writes the files; others mark them stale when they write to Chroma
+        self.writable = writable
+        self.stale_path = os.path.join(directory, "embeddings.stale")
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._opened = False
+
+    def _open(self) -> None:
+        """Read the stored IDs and embedding dimension, once"""
+        if self._opened:
+            return
+        self._opened = True
+        try:
+            with open(self.meta_path) as f:
+                dim = json.load(f)["dim"]
+            ids = np.fromfile(self.ids_path, dtype=f"S{ID_WIDTH}")
+            if dim and os.path.getsize(self.embeddings_path) < len(ids) * dim * 4:
+                raise ValueError("embedding file is shorter than the ID file")
+            self.dim = dim
+            self.ids = [doc_id.decode() for doc_id in ids.tolist()]
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(self.meta_path):
+                logger.warning(f"Discarding unreadable embedding file: {e}")
+            self.dim = None
+            self.ids = []
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def load(self, doc_ids: List[str],
+             load_embeddings: Callable[[], Tuple[List[str], np.ndarray]]) -> Tuple[List[str], np.ndarray]:
+        """Map the stored embeddings, rebuilding the files from stored embeddings when they are missing or stale"""
+        self._open()
+        if (self.dim and not os.path.exists(self.stale_path) and
+                len(self.ids) == len(doc_ids) and self._rows.keys() == set(doc_ids)):
+            if not self.writable:
+                # The owner may overwrite rows in place, so take a private copy instead of a mapping
+                logger.info(f"Read {len(self.ids)} embeddings from {self.embeddings_path}")
+                embeddings = np.fromfile(self.embeddings_path, dtype=np.float32, count=len(self.ids) * self.dim)
+                return list(self.ids), embeddings.reshape(len(self.ids), self.dim)
+            logger.info(f"Mapped {len(self.ids)} embeddings from {self.embeddings_path}")
+            # Copy-on-write, so in-place index updates never reach the file behind the store's back
+            return list(self.ids), np.memmap(
+                self.embeddings_path, dtype=np.float32, mode="c", shape=(len(self.ids), self.dim)
+            )
+
+        if not self.writable:
+            return load_embeddings()
+        logger.info("Rebuilding embedding file from stored embeddings")
+        # Cleared before reading, so writes by other instances from here on mark the rebuilt files stale again
+        if os.path.exists(self.stale_path):
+            os.remove(self.stale_path)
+        ids, embeddings = load_embeddings()
+        self._write_all(ids, embeddings)
+        return ids, embeddings
+
+    def _mark_stale(self) -> None:
+        """Record that the files miss writes made by an instance that does not own them"""
+        open(self.stale_path, "a").close()
+
+    def _write_all(self, ids: List[str], embeddings: np.ndarray) -> None:
+        """Replace the files with the given IDs and embeddings"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        dim = embeddings.shape[1] if embeddings.ndim == 2 and len(ids) else 0
+        for path, data in ((self.embeddings_path, embeddings.tobytes() if dim else b""),
+                           (self.ids_path, np.array(ids, dtype=f"S{ID_WIDTH}").tobytes() if dim else b"")):
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f"{path}.tmp", path)
+        with open(self.meta_path, "w") as f:
+            json.dump({"dim": dim}, f)
+
+        self._opened = True
+        self.dim = dim or None
+        self.ids = list(ids) if dim else []
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray) -> None:
+        """Overwrite the rows of known IDs in place and append the rest, touching only this batch"""
+        if not ids:
+            return
+        if not self.writable:
+            self._mark_stale()
+            return
+        self._open()
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.dim != embeddings.shape[1]:
+            # First write, or the embedding model changed
+            self._write_all(ids, embeddings)
+            return
+
+        row_bytes = self.dim * 4
+        new_rows = []
+        with open(self.embeddings_path, "r+b") as f:
+            for i, doc_id in enumerate(ids):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    new_rows.append(i)
+                else:
+                    f.seek(row * row_bytes)
+                    f.write(embeddings[i].tobytes())
+            if new_rows:
+                # Write over any tail left behind by an interrupted append
+                f.seek(len(self.ids) * row_bytes)
+                f.write(embeddings[new_rows].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        if new_rows:
+            # IDs are appended after their embeddings, so a crash never leaves an ID without a row
+            new_ids = [ids[i] for i in new_rows]
+            with open(self.ids_path, "ab") as f:
+                f.write(np.array(new_ids, dtype=f"S{ID_WIDTH}").tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            for doc_id in new_ids:
+                self._rows[doc_id] = len(self.ids)
+                self.ids.append(doc_id)
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove the rows for the given IDs, rewriting the files"""
+        if not self.writable:
+            self._mark_stale()
+            return
+        self._open()
+        rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+        if not rows:
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        embeddings = np.fromfile(self.embeddings_path, dtype=np.float32, count=len(self.ids) * self.dim)
+        embeddings = embeddings.reshape(len(self.ids), self.dim)[keep]
+        self._write_all([doc_id for doc_id, kept in zip(self.ids, keep) if kept], embeddings)